@@ -2,7 +2,7 @@ from langchain_core.messages import AIMessage
 from .workflow import AgentState
 from db.session import async_session_factory
 from services.document_service import DocumentService
-from services.rag_service import RAGService
+from services.indexing_queue import IndexingQueue
 from services.user_service import get_or_create_user
 
 async def document_agent_node(state: AgentState) -> AgentState:
@@ -30,14 +30,10 @@ async def document_agent_node(state: AgentState) -> AgentState:
                 metadata={"mime_type": context.get("mime_type")}
             )
             
-            # 2. Index in RAG
-            rag_service = RAGService(session)
-            indexed = await rag_service.index_document(document.id)
+            # 2. Queue indexing; the worker notifies the user when it's done
+            await IndexingQueue(session).enqueue(document.id, notify_telegram_id=user.telegram_id)
             
-            if indexed:
-                response_text = f"✅ Документ **{document.original_filename}** успешно обработан и добавлен в базу знаний!\nТеперь вы можете задавать вопросы по его содержанию."
-            else:
-                response_text = f"⚠️ Документ **{document.original_filename}** сохранен, но не удалось проиндексировать текст. Возможно, формат не поддерживается или файл пуст."
+            response_text = f"📥 Документ **{document.original_filename}** сохранен и поставлен в очередь на обработку.\nЯ сообщу, когда он будет добавлен в базу знаний."
                 
     except Exception as e:
         response_text = f"❌ Ошибка при обработке документа: {str(e)}"
@@ -1,5 +1,6 @@
 from langchain_core.messages import AIMessage
-from .workflow import AgentState, llm, SystemMessage
+from .workflow import AgentState, SystemMessage
+from services.llm_gateway import get_llm
 from services.image_service import image_service
 from telegram.bot import bot
 
@@ -17,7 +18,7 @@ async def image_agent_node(state: AgentState) -> AgentState:
 """
     
     # Extract prompt for DALL-E
-    prompt_response = await llm.ainvoke([
+    prompt_response = await get_llm("generator").ainvoke([
         SystemMessage(content=system_prompt),
         last_message
     ])
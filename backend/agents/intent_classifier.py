@@ -0,0 +1,261 @@
+"""Local intent classification in front of the LLM router: rules plus a small in-process model."""
+import logging
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+INTENTS = ("task", "calendar", "reminder", "image", "document", "knowledge", "search", "general")
+
+# Intents whose agents write data; the model alone never routes to them
+ACTION_INTENTS = ("task", "calendar", "reminder")
+
+
+class IntentPrediction(NamedTuple):
+    """Classification result with its confidence (0..1) and where it came from."""
+    intent: str
+    confidence: float
+    source: str  # rule, model, llm
+    margin: float = 1.0  # confidence minus the runner-up's (model only)
+
+
+# Main menu buttons (telegram/keyboards.py) map to an intent with certainty
+MENU_INTENTS = {
+    "📝 новая задача": "task",
+    "📋 мои задачи": "task",
+    "📅 календарь": "calendar",
+    "🗓️ мое расписание": "calendar",
+    "⏰ напоминание": "reminder",
+    "📚 база знаний": "knowledge",
+    "🖼️ генерация картинки": "image",
+    "📄 документы": "document",
+    "⚙️ настройки": "general",
+    "❓ помощь": "general",
+}
+
+# (intent, pattern, confidence); matched against the lowercased message
+RULES: List[Tuple[str, re.Pattern, float]] = [
+    ("reminder", re.compile(r"\bнапомни|\bнапоминани|\bremind"), 0.95),
+    ("image", re.compile(r"\bнарису|\b(сгенерир\w*|созда\w*|сдела\w*) (мне )?(картинк|изображени|рисун|арт)|\bdraw\b"), 0.95),
+    ("task", re.compile(r"\b(созда\w*|добав\w*|нов\w*|запиши) (мне )?(задач|в список|в туду)|\bсписок дел|\bмои задачи|\btodo\b"), 0.9),
+    ("calendar", re.compile(r"\bзапланиру|\bв календар|\b(назнач\w*|добав\w*|созда\w*) (мне )?(встреч|событи|созвон)|\bмое расписание"), 0.9),
+    ("knowledge", re.compile(r"\bв (моих |моём |моем )?(документ|базе знаний|файл|договор)|\bпо (моим )?документам"), 0.9),
+    ("search", re.compile(r"\b(найди|поищи|погугли|загугли) в (интернете|сети|гугле)|\bпоследние новости|\bкурс (доллара|евро|рубля|биткоина)|\bпогод[аеуы]"), 0.9),
+    ("general", re.compile(r"^(привет|здравствуй\w*|добр\w+ (утро|день|вечер)|хай|hi|hello|спасибо|благодарю|пока|ок|окей)[\s!.,)]*$"), 0.95),
+]
+
+# Seed examples for the in-process model
+TRAINING_EXAMPLES: Dict[str, List[str]] = {
+    "task": [
+        "создай задачу купить молоко", "добавь задачу позвонить маме", "новая задача подготовить отчет",
+        "покажи мои задачи", "что у меня в списке дел", "отметь задачу как выполненную",
+        "добавь в список покупок хлеб", "удали задачу про отчет", "какие задачи на сегодня",
+        "запиши задачу оплатить интернет", "нужно сделать презентацию к пятнице", "список задач",
+    ],
+    "calendar": [
+        "добавь встречу завтра в 15:00", "запланируй созвон с командой в понедельник",
+        "создай событие день рождения 12 мая", "что у меня в календаре на завтра", "мое расписание на неделю",
+        "встреча с клиентом в четверг в 10 утра", "перенеси встречу на пятницу", "какие встречи сегодня",
+        "поставь в календарь обед с Иваном", "запланируй тренировку на субботу",
+    ],
+    "reminder": [
+        "напомни через 15 минут выключить духовку", "напомни завтра позвонить врачу",
+        "поставь напоминание на 9 утра", "напоминание выпить таблетку в 21:00",
+        "не дай мне забыть про оплату счета", "напомни мне про встречу за час",
+        "remind me to call mom", "создай напоминание купить подарок",
+    ],
+    "image": [
+        "нарисуй кота", "сгенерируй картинку заката над морем", "нарисуй логотип для кофейни",
+        "создай изображение космического корабля", "сделай картинку с собакой в шляпе",
+        "нарисуй портрет в стиле аниме", "draw a cat in space", "хочу картинку с горами",
+    ],
+    "document": [
+        "обработай этот файл", "загрузи документ", "вот документ сохрани его",
+        "прочитай pdf который я отправил", "добавь этот файл в базу знаний", "обработай вложение",
+    ],
+    "knowledge": [
+        "что написано в договоре про сроки", "найди в документах информацию о проекте",
+        "что ты знаешь о python", "что сказано в моих заметках про отпуск",
+        "какие условия оплаты в контракте", "найди в базе знаний инструкцию по деплою",
+        "что в документе про штрафы", "по моим документам когда дедлайн",
+        "что говорится в файле о бюджете", "расскажи что есть в базе знаний про клиентов",
+    ],
+    "search": [
+        "найди дешевые авиабилеты в дубай", "какие сегодня новости в мире ит",
+        "что такое langchain", "сколько стоит iphone 15", "найди в интернете рецепт борща",
+        "курс доллара на сегодня", "какая погода в москве", "последние новости про openai",
+        "поищи отзывы о ноутбуке", "цены на билеты в театр",
+    ],
+    "general": [
+        "привет", "привет как дела", "спасибо", "что ты умеешь", "кто ты",
+        "расскажи анекдот", "доброе утро", "пока", "как тебя зовут", "помоги мне",
+        "ты молодец", "hello", "давай поговорим",
+    ],
+}
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().replace("ё", "е").split())
+
+
+def _features(text: str) -> List[str]:
+    """Word unigrams plus character 3/4-grams of each word (robust to Russian inflection)."""
+    features = []
+    for word in re.findall(r"\w+", text):
+        features.append(f"w:{word}")
+        padded = f" {word} "
+        for n in (3, 4):
+            features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return features
+
+
+class NaiveBayesIntentModel:
+    """
+    Multinomial naive Bayes over word and character n-gram features.
+
+    Log-likelihoods are averaged per feature before the softmax, which keeps
+    confidences from saturating on long messages; ``sharpness`` sets how
+    decisive the model is.
+    """
+
+    def __init__(self, examples: Dict[str, List[str]], sharpness: float = 6.0):
+        """Train on labelled examples."""
+        self.sharpness = sharpness
+        self.counts: Dict[str, Counter] = {}
+        self.totals: Dict[str, int] = {}
+        vocabulary = set()
+        for intent, texts in examples.items():
+            counter = Counter()
+            for text in texts:
+                counter.update(_features(_normalize(text)))
+            self.counts[intent] = counter
+            self.totals[intent] = sum(counter.values())
+            vocabulary.update(counter)
+        self.vocabulary_size = len(vocabulary)
+
+    def predict(self, text: str) -> Optional[IntentPrediction]:
+        """Most likely intent, or None if the text has no known features."""
+        features = [f for f in _features(_normalize(text)) if any(f in c for c in self.counts.values())]
+        if not features:
+            return None
+
+        scores = {}
+        for intent, counter in self.counts.items():
+            denominator = self.totals[intent] + self.vocabulary_size
+            log_likelihood = sum(math.log((counter[f] + 1) / denominator) for f in features)
+            scores[intent] = self.sharpness * log_likelihood / len(features)
+
+        top = max(scores.values())
+        exp = {intent: math.exp(score - top) for intent, score in scores.items()}
+        total = sum(exp.values())
+        first, second = sorted(exp.values(), reverse=True)[:2]
+        intent = max(exp, key=exp.get)
+        return IntentPrediction(intent, first / total, "model", (first - second) / total)
+
+
+_model = NaiveBayesIntentModel(TRAINING_EXAMPLES)
+
+
+def match_rules(text: str) -> Optional[IntentPrediction]:
+    """Menu buttons and keyword rules; conflicting matches lower the confidence."""
+    normalized = _normalize(text)
+    if normalized in MENU_INTENTS:
+        return IntentPrediction(MENU_INTENTS[normalized], 1.0, "rule")
+
+    matches = {}
+    for intent, pattern, confidence in RULES:
+        if pattern.search(normalized):
+            matches[intent] = max(confidence, matches.get(intent, 0.0))
+    if not matches:
+        return None
+
+    intent = max(matches, key=matches.get)
+    confidence = matches[intent]
+    if len(matches) > 1:
+        # e.g. "напомни про встречу в календаре" - let a later stage decide
+        confidence /= len(matches)
+    return IntentPrediction(intent, confidence, "rule")
+
+
+def classify_intent(text: str) -> Optional[IntentPrediction]:
+    """
+    Classify a message locally, without network calls.
+
+    Args:
+        text: User message
+
+    Returns:
+        The more confident of the rule and model predictions, or None;
+        see is_decisive for whether it may skip the LLM
+    """
+    rule = match_rules(text)
+    if rule and rule.confidence >= settings.intent_local_threshold:
+        return rule
+    prediction = _model.predict(text)
+    candidates = [p for p in (rule, prediction) if p]
+    return max(candidates, key=lambda p: p.confidence) if candidates else None
+
+
+def is_decisive(prediction: Optional[IntentPrediction]) -> bool:
+    """
+    Whether a local prediction may be used without asking the LLM.
+
+    Rules and menu buttons decide on their own. The model's scores are only
+    trusted with a clear lead over the runner-up (thresholds measured with
+    benchmark_intent_classifier.py), and never for action intents, whose
+    agents write data.
+    """
+    if prediction is None:
+        return False
+    if prediction.source == "rule":
+        return prediction.confidence >= settings.intent_local_threshold
+    return (
+        prediction.intent not in ACTION_INTENTS
+        and prediction.confidence >= settings.intent_model_threshold
+        and prediction.margin >= settings.intent_model_margin
+    )
+
+
+class IntentMetrics:
+    """Per-intent counts of which stage decided, plus LLM agreement with unsure local guesses."""
+
+    def __init__(self):
+        """Initialize empty counters."""
+        self._lock = threading.Lock()
+        self._decided: Dict[str, Counter] = defaultdict(Counter)
+        self._agreement = Counter()
+
+    def record(self, intent: str, source: str, local_guess: Optional[str] = None) -> None:
+        """Count a routing decision; for LLM decisions, whether the local guess was right."""
+        with self._lock:
+            self._decided[intent][source] += 1
+            if source == "llm" and local_guess:
+                self._agreement["agree" if local_guess == intent else "disagree"] += 1
+
+    def snapshot(self) -> dict:
+        """Counts and local hit rate (share decided without the LLM) per intent."""
+        with self._lock:
+            intents = {}
+            for intent, counter in self._decided.items():
+                total = sum(counter.values())
+                intents[intent] = {
+                    **counter,
+                    "total": total,
+                    "local_hit_rate": round((total - counter["llm"]) / total, 3) if total else 0.0,
+                }
+            total = sum(i["total"] for i in intents.values())
+            local = sum(i["total"] - i.get("llm", 0) for i in intents.values())
+            return {
+                "intents": intents,
+                "total": total,
+                "local_hit_rate": round(local / total, 3) if total else 0.0,
+                "llm_agreement": dict(self._agreement),
+            }
+
+
+intent_metrics = IntentMetrics()
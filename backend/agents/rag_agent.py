@@ -1,7 +1,11 @@
 from langchain_core.messages import AIMessage, SystemMessage
-from .workflow import AgentState, llm
+from .workflow import AgentState
+from config import settings
 from db.session import async_session_factory
-from services.rag_service import RAGService
+from services.rag_service import RAGService, is_identifier_query
+from services.context_builder import build_context
+from services.answer_cache import AnswerCache
+from services.llm_gateway import get_llm
 from services.user_service import get_or_create_user
 
 async def rag_agent_node(state: AgentState) -> AgentState:
@@ -15,9 +19,29 @@ async def rag_agent_node(state: AgentState) -> AgentState:
             # Get or create user
             user = await get_or_create_user(session, state["user_id"], state.get("context"))
             
-            # 1. Search in RAG
             rag_service = RAGService(session)
-            search_results = rag_service.search(query, user_id=user.id, limit=5)
+            # Embedded up front only for the answer cache; otherwise search embeds
+            # if it needs to. Identifier queries skip the cache: "полис 12345" and
+            # "полис 12346" embed almost identically, and the lexical fast path
+            # answers them without embedding at all.
+            query_vector = None
+            if settings.rag_answer_cache_enabled and rag_service.embeddings and not is_identifier_query(query):
+                query_vector = await rag_service.embed_query(query)
+            
+            # 0. Answer to an equivalent question against the same knowledge base
+            answer_cache = AnswerCache(user.id) if query_vector else None
+            if answer_cache:
+                cached_answer = await answer_cache.lookup(query_vector)
+                if cached_answer:
+                    return {**state, "messages": [AIMessage(content=cached_answer)]}
+            
+            # 1. Search in RAG
+            search_results = await rag_service.search(
+                query,
+                user_id=user.id,
+                limit=settings.rag_search_limit,
+                query_vector=query_vector
+            )
             
             if not search_results:
                 return {
@@ -25,11 +49,8 @@ async def rag_agent_node(state: AgentState) -> AgentState:
                     "messages": [AIMessage(content="🤔 Я поискал в вашей базе знаний, но не нашел точной информации по этому запросу. Попробуйте переформулировать вопрос или загрузить соответствующие документы.")]
                 }
             
-            # 2. Construct Prompt with Context
-            context_text = "\n\n".join([
-                f"Document: {res['filename']}\nContent: {res['text']}" 
-                for res in search_results
-            ])
+            # 2. Construct Prompt with Context (merged, deduplicated, token-budgeted)
+            context_text = build_context(search_results)
             
             rag_prompt = f"""Ты интеллектуальный помощник Jarvis.
 Твоя задача - ответить на вопрос пользователя, используя ТОЛЬКО предоставленный ниже контекст из базы знаний.
@@ -49,12 +70,15 @@ async def rag_agent_node(state: AgentState) -> AgentState:
 """
             
             # 3. Generate Answer
-            response_ai = await llm.ainvoke([
+            response_ai = await get_llm("generator").ainvoke([
                 SystemMessage(content=rag_prompt)
-            ])
+            ], stream_tokens=True)
             
             response_text = response_ai.content
             
+            if answer_cache:
+                await answer_cache.store(query, query_vector, response_text)
+            
     except Exception as e:
         response_text = f"❌ Ошибка при поиске информации: {str(e)}"
     
@@ -1,7 +1,7 @@
-import json
-from datetime import datetime, timedelta
-from langchain_core.messages import AIMessage, SystemMessage, HumanMessage
-from .workflow import AgentState, llm
+from langchain_core.messages import AIMessage
+from .workflow import AgentState
+from .slots import extract_slots
+from services.llm_gateway import get_llm
 from db.session import async_session_factory
 from services.reminder_service import ReminderService
 from services.user_service import get_or_create_user
@@ -11,38 +11,10 @@ async def reminder_agent_node(state: AgentState) -> AgentState:
     messages = state["messages"]
     last_message = messages[-1]
     
-    # 1. Extract details using LLM
-    extraction_prompt = """Extract reminder details from the user's request.
-Return a JSON object with:
-- title: simple description of the reminder
-- remind_at: ISO 8601 datetime string (YYYY-MM-DDTHH:MM:SS) calculated based on "now".
-- message: optional detailed message (or null)
-
-Assume "now" is the current time. 
-If specific time isn't given but "in X minutes" is, calculate it.
-If no time is given, default to +1 hour from now.
-
-Current time: {current_time}
-User Request: {user_request}
-"""
-    
-    # Adjust to user's timezone (UTC+3 for Moscow)
-    # In a full production app, this should be taken from user settings
-    utc_now = datetime.utcnow()
-    user_now = utc_now + timedelta(hours=3)
-    current_time = user_now.isoformat()
-    
     try:
-        extraction_response = await llm.ainvoke([
-            SystemMessage(content=extraction_prompt.format(
-                current_time=current_time,
-                user_request=last_message.content
-            ))
-        ])
-        
-        # Clean parsing of JSON from LLM response
-        content = extraction_response.content.replace("```json", "").replace("```", "").strip()
-        data = json.loads(content)
+        # 1. Arguments extracted while routing, or a single structured call
+        # (times are the user's local time, UTC+3, see slots.user_now)
+        args = state.get("slots") or await extract_slots(get_llm("extractor"), "reminder", last_message.content)
         
         # 2. Save to Database
         async with async_session_factory() as session:
@@ -55,13 +27,11 @@ User Request: {user_request}
             # but for now we'll store what the LLM gave us which is "user time".
             # The worker needs to check against "user time" or we convert here.
             # Strategy: Store as is. Worker checks: is reminder_time <= (UTC_now + 3h)?
-            remind_at = datetime.fromisoformat(data["remind_at"])
-            
             reminder = await reminder_service.create_reminder(
                 user_id=user.id,
-                title=data["title"],
-                remind_at=remind_at,
-                message=data.get("message")
+                title=args.title,
+                remind_at=args.remind_at,
+                message=args.message
             )
             
             # Detailed response with User Time
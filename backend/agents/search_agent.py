@@ -3,29 +3,10 @@ import logging
 from typing import TypedDict, Annotated
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from langchain_community.tools import DuckDuckGoSearchResults
-from config import settings
+from services.llm_gateway import get_llm
 
 logger = logging.getLogger(__name__)
 
-# Initialize LLM based on configuration
-def get_llm():
-    """Get LLM instance based on settings."""
-    if settings.use_ollama:
-        from langchain_community.llms import Ollama
-        return Ollama(
-            base_url=settings.ollama_base_url,
-            model=settings.ollama_model,
-            temperature=0.7,
-        )
-    else:
-        from langchain_openai import ChatOpenAI
-        return ChatOpenAI(
-            model=settings.openai_model,
-            temperature=0.7,
-            api_key=settings.openai_api_key
-        )
-
-llm = get_llm()
 search_tool = DuckDuckGoSearchResults(backend="text", num_results=5)
 
 async def search_agent_node(state: dict) -> dict:
@@ -44,7 +25,7 @@ async def search_agent_node(state: dict) -> dict:
         search_query_prompt = f"""Сформулируй краткий и точный поисковый запрос (2-5 слов максимум) 
 на основе этого сообщения пользователя: "{user_query}". Верни ТОЛЬКО текст запроса без кавычек и пояснений."""
         
-        query_response = await llm.ainvoke([HumanMessage(content=search_query_prompt)])
+        query_response = await get_llm("extractor").ainvoke([HumanMessage(content=search_query_prompt)])
         optimized_query = query_response.content.strip()
         logger.info(f"Optimized search query: {optimized_query}")
         
@@ -64,7 +45,10 @@ async def search_agent_node(state: dict) -> dict:
 
 Напиши понятный ответ на русском языке на основе этих результатов."""
         
-        final_response = await llm.ainvoke([SystemMessage(content=synthesis_prompt)])
+        final_response = await get_llm("generator").ainvoke(
+            [SystemMessage(content=synthesis_prompt)],
+            stream_tokens=True
+        )
         
         return {
             **state,
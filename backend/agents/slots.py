@@ -0,0 +1,149 @@
+"""Typed arguments of action intents, extracted with structured output (function calling)."""
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Literal, Optional, Type
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from pydantic import BaseModel, Field
+
+from .intent_classifier import INTENTS
+
+logger = logging.getLogger(__name__)
+
+
+class TaskArgs(BaseModel):
+    """
+    Action on the user's task list, e.g. "Купи молоко" -> create "Купи молоко",
+    "Покажи мои задачи" -> list, "Удали задачу 5" -> delete "5".
+    """
+    action: Literal["create", "list", "complete", "delete"] = Field(description="What to do with tasks")
+    title: Optional[str] = Field(
+        default=None,
+        description="Task title (create) or task ID / title keywords to find the task (complete, delete)"
+    )
+    description: Optional[str] = Field(default=None, description="Optional details (create)")
+    priority: Literal["low", "medium", "high"] = "medium"
+
+
+class CalendarArgs(BaseModel):
+    """Calendar event to create."""
+    title: str = Field(description="Event title")
+    start_time: datetime = Field(description="Start, ISO 8601 (YYYY-MM-DDTHH:MM:SS)")
+    end_time: Optional[datetime] = Field(default=None, description="End, ISO 8601; omit for one hour")
+    description: Optional[str] = None
+
+
+class ReminderArgs(BaseModel):
+    """Reminder to create."""
+    title: str = Field(description="Short description of the reminder")
+    remind_at: datetime = Field(
+        description="When to remind, ISO 8601, computed from the current time; one hour from now if no time is given"
+    )
+    message: Optional[str] = Field(default=None, description="Optional detailed message")
+
+
+class RouteDecision(BaseModel):
+    """Intent of the user's message, with arguments for action intents."""
+    intent: Literal[INTENTS]
+    task: Optional[TaskArgs] = Field(default=None, description="Required when intent is task")
+    calendar: Optional[CalendarArgs] = Field(default=None, description="Required when intent is calendar")
+    reminder: Optional[ReminderArgs] = Field(default=None, description="Required when intent is reminder")
+
+    def slots(self) -> Optional[BaseModel]:
+        """Arguments of the chosen intent, if it has any."""
+        return getattr(self, self.intent, None) if self.intent in SLOT_SCHEMAS else None
+
+
+SLOT_SCHEMAS: Dict[str, Type[BaseModel]] = {
+    "task": TaskArgs,
+    "calendar": CalendarArgs,
+    "reminder": ReminderArgs,
+}
+
+
+def user_now() -> datetime:
+    """Current time of the user (UTC+3, Moscow); should come from user settings."""
+    return datetime.utcnow() + timedelta(hours=3)
+
+
+def supports_tools(llm) -> bool:
+    """Whether the model accepts OpenAI function calling (see GatewayLLM.supports_tools)."""
+    return getattr(llm, "supports_tools", False)
+
+
+def _tool(name: str, schema: Type[BaseModel]) -> dict:
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": schema.__doc__,
+            "parameters": schema.model_json_schema(),
+        },
+    }
+
+
+async def call_with_schema(llm, name: str, schema: Type[BaseModel], messages: List) -> BaseModel:
+    """
+    Call the LLM once and parse its answer into a schema.
+
+    Chat models with function calling are forced to call a single tool, so
+    the arguments always come back as JSON; other models get the JSON schema
+    in the prompt.
+
+    Args:
+        llm: Gateway model (services.llm_gateway.get_llm)
+        name: Tool name
+        schema: Pydantic model of the expected arguments
+        messages: Prompt messages
+
+    Returns:
+        Validated schema instance
+
+    Raises:
+        ValueError: The model returned no or invalid arguments
+    """
+    if supports_tools(llm):
+        response = await llm.bind(
+            tools=[_tool(name, schema)],
+            tool_choice={"type": "function", "function": {"name": name}}
+        ).ainvoke(messages)
+        tool_calls = response.additional_kwargs.get("tool_calls") or []
+        if not tool_calls:
+            raise ValueError(f"Model did not call {name}")
+        arguments = tool_calls[0]["function"]["arguments"]
+    else:
+        instructions = (
+            f"Return ONLY a JSON object matching this JSON schema:\n"
+            f"{json.dumps(schema.model_json_schema(), ensure_ascii=False)}"
+        )
+        response = await llm.ainvoke([*messages, SystemMessage(content=instructions)])
+        content = response.content if hasattr(response, "content") else response
+        arguments = content.replace("```json", "").replace("```", "").strip()
+
+    try:
+        return schema.model_validate_json(arguments)
+    except Exception as e:
+        raise ValueError(f"Invalid {name} arguments: {e}") from e
+
+
+async def extract_slots(llm, intent: str, user_message: str) -> BaseModel:
+    """
+    Extract the arguments of an action intent from a message.
+
+    Used when routing didn't produce them (local classification, models
+    without function calling).
+
+    Args:
+        llm: Gateway model
+        intent: task, calendar or reminder
+        user_message: User's message
+
+    Returns:
+        TaskArgs, CalendarArgs or ReminderArgs
+    """
+    schema = SLOT_SCHEMAS[intent]
+    return await call_with_schema(llm, f"{intent}_args", schema, [
+        SystemMessage(content=f"Extract the arguments from the user's request.\nCurrent time: {user_now().isoformat()}"),
+        HumanMessage(content=user_message),
+    ])
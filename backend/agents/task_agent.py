@@ -1,7 +1,8 @@
-import json
 from datetime import datetime
-from langchain_core.messages import AIMessage, SystemMessage
-from .workflow import AgentState, llm
+from langchain_core.messages import AIMessage
+from .workflow import AgentState
+from .slots import extract_slots
+from services.llm_gateway import get_llm
 from db.session import async_session_factory
 from services.task_service import TaskService
 from services.user_service import get_or_create_user
@@ -11,32 +12,10 @@ async def task_agent_node(state: AgentState) -> AgentState:
     messages = state["messages"]
     last_message = messages[-1]
     
-    # 1. Extract details using LLM
-    # 1. Extract details and intent using LLM
-    extraction_prompt = """Analyze the user's request regarding tasks.
-Return a JSON object with:
-- intent: "create", "list", "complete", or "delete"
-- title: task title (for create) or keywords to find task (for complete/delete)
-- description: optional details (for create)
-- priority: low, medium, or high (default: medium)
-
-Examples:
-"Buy milk" -> {"intent": "create", "title": "Buy milk"}
-"Show my tasks" -> {"intent": "list"}
-"Complete task Buy milk" -> {"intent": "complete", "title": "Buy milk"}
-"Delete task 5" -> {"intent": "delete", "title": "5"}
-
-User Request: {user_request}
-"""
-    
     try:
-        extraction_response = await llm.ainvoke([
-            SystemMessage(content=extraction_prompt.format(user_request=last_message.content))
-        ])
-        
-        content = extraction_response.content.replace("```json", "").replace("```", "").strip()
-        data = json.loads(content)
-        intent = data.get("intent", "create")
+        # 1. Arguments extracted while routing, or a single structured call
+        args = state.get("slots") or await extract_slots(get_llm("extractor"), "task", last_message.content)
+        intent = args.action
         
         # 2. Execute Action
         async with async_session_factory() as session:
@@ -47,9 +26,9 @@ User Request: {user_request}
             if intent == "create":
                 task = await task_service.create_task(
                     user_id=user.id,
-                    title=data.get("title", "New Task"),
-                    description=data.get("description"),
-                    priority=data.get("priority", "medium")
+                    title=args.title or "New Task",
+                    description=args.description,
+                    priority=args.priority
                 )
                 response_text = f"✅ Задача добавлена!\n\n📝 **{task.title}**\nПриоритет: {task.priority}"
                 
@@ -71,7 +50,7 @@ User Request: {user_request}
             elif intent == "complete":
                 # Simple search by ID or strict title match (improvement: fuzzy search)
                 tasks = await task_service.get_user_tasks(user.id)
-                target_title = str(data.get("title", "")).lower()
+                target_title = (args.title or "").lower()
                 
                 target_task = None
                 # Try to find by ID first if title is a number
@@ -87,11 +66,11 @@ User Request: {user_request}
                     updated = await task_service.update_task(target_task.id, user.id, status="completed", completed_at=datetime.utcnow())
                     response_text = f"✅ Задача \"{updated.title}\" отмечена выполненной!"
                 else:
-                    response_text = f"❌ Не удалось найти задачу \"{data.get('title')}\""
+                    response_text = f"❌ Не удалось найти задачу \"{args.title}\""
 
             elif intent == "delete":
                  tasks = await task_service.get_user_tasks(user.id)
-                 target_title = str(data.get("title", "")).lower()
+                 target_title = (args.title or "").lower()
                  
                  target_task = None
                  if target_title.isdigit():
@@ -1,39 +1,24 @@
 """Agentic workflow using LangGraph."""
+import asyncio
 import logging
-from typing import Literal, TypedDict, Annotated
+from typing import Any, AsyncIterator, Literal, TypedDict, Annotated
 from langgraph.graph import StateGraph
 from langgraph.graph.message import add_messages
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 from config import settings
+from services.llm_gateway import get_llm, token_sink
+from .intent_classifier import INTENTS, classify_intent, intent_metrics, is_decisive
+from .slots import RouteDecision, call_with_schema, supports_tools, user_now
 
 logger = logging.getLogger(__name__)
 
-# Initialize LLM based on configuration
-def get_llm():
-    """Get LLM instance based on settings."""
-    if settings.use_ollama:
-        from langchain_community.llms import Ollama
-        return Ollama(
-            base_url=settings.ollama_base_url,
-            model=settings.ollama_model,
-            temperature=0.7,
-        )
-    else:
-        from langchain_openai import ChatOpenAI
-        return ChatOpenAI(
-            model=settings.openai_model, # Use settings.openai_model as in original
-            temperature=0.7,
-            api_key=settings.openai_api_key
-        )
-
-llm = get_llm()
-
 
 class AgentState(TypedDict):
     """State for the agentic workflow."""
     messages: Annotated[list, add_messages]
     user_id: int
     intent: str | None
+    slots: Any  # TaskArgs/CalendarArgs/ReminderArgs extracted while routing
     context: dict
 
 
@@ -46,11 +31,47 @@ from .document_agent import document_agent_node
 from .rag_agent import rag_agent_node
 from .search_agent import search_agent_node
 
+INTENT_DESCRIPTIONS = """- task: если пользователь хочет создать задачу, обновить задачу, посмотреть список задач, управлять списками дел
+- calendar: если пользователь хочет создать событие в календаре, встречу, запланировать что-то на конкретную дату/время
+- reminder: если пользователь просит напомнить о чём-то, создать напоминание
+- image: если пользователь просит нарисовать, сгенерировать, создать изображение/картинку
+- document: если пользователь загружает документ или просит обработать файл
+- knowledge: если пользователь задаёт вопрос, требующий поиска в базе знаний или документах
+- search: если пользователь просит найти актуальную информацию в интернете, новости, поискать ссылки на товары, цены на билеты
+- general: обычная беседа, приветствие, или неясное намерение
+
+Примеры:
+"Создай задачу купить молоко" -> task
+"Добавь встречу завтра в 15:00" -> calendar
+"Найти дешевые авиабилеты в Дубай" -> search
+"Какие сегодня новости в мире ИТ?" -> search
+"Что такое LangChain?" -> search
+"Нарисуй кота" -> image
+"Что ты знаешь о Python?" -> knowledge
+"Привет, как дела?" -> general"""
+
+# Models without function calling answer with the intent only
+CLASSIFY_PROMPT = """Ты классификатор намерений пользователя. Определи намерение и верни ТОЛЬКО одно слово:
+
+{intents}
+
+Сообщение пользователя: """
+
+# Models with function calling also extract the arguments of action intents
+ROUTE_PROMPT = """Ты классификатор намерений пользователя. Определи намерение и вызови функцию route.
+Для task, calendar и reminder заполни соответствующие аргументы (даты в ISO 8601, от текущего времени).
+
+{intents}
+
+Текущее время: {current_time}"""
+
+
 # Router Node (Sync wrapper logic)
 async def router_node(state: AgentState) -> AgentState:
     """
     Analyze state and Determine intent.
-    This node calls the LLM to classify the intent and updates the state.
+    Tries the local classifier first and calls the LLM only when it is unsure;
+    with function calling, that call also extracts the action's arguments.
     """
     messages = state["messages"]
     last_message = messages[-1] if messages else None
@@ -66,38 +87,44 @@ async def router_node(state: AgentState) -> AgentState:
     
     user_message = last_message.content
     
-    # System prompt for intent classification
-    system_prompt = """Ты классификатор намерений пользователя. Определи намерение и верни ТОЛЬКО одно слово:
-
-- task: если пользователь хочет создать задачу, обновить задачу, посмотреть список задач, управлять списками дел
-- calendar: если пользователь хочет создать событие в календаре, встречу, запланировать что-то на конкретную дату/время
-- reminder: если пользователь просит напомнить о чём-то, создать напоминание
-- image: если пользователь просит нарисовать, сгенерировать, создать изображение/картинку
-- document: если пользователь загружает документ или просит обработать файл
-- knowledge: если пользователь задаёт вопрос, требующий поиска в базе знаний или документах
-- search: если пользователь просит найти актуальную информацию в интернете, новости, поискать ссылки на товары, цены на билеты
-- general: обычная беседа, приветствие, или неясное намерение
-
-Примеры:
-"Создай задачу купить молоко" -> task
-"Добавь встречу завтра в 15:00" -> calendar
-"Найти дешевые авиабилеты в Дубай" -> search
-"Какие сегодня новости в мире ИТ?" -> search
-"Что такое LangChain?" -> search
-"Нарисуй кота" -> image
-"Что ты знаешь о Python?" -> knowledge
-"Привет, как дела?" -> general
-
-Сообщение пользователя: """
+    # Obvious messages are classified locally, without an LLM round trip
+    local = classify_intent(user_message) if settings.intent_local_enabled else None
+    if is_decisive(local):
+        intent_metrics.record(local.intent, local.source)
+        logger.info(
+            f"Detected intent: {local.intent} ({local.source}, {local.confidence:.2f}) "
+            f"for message: {user_message[:50]}..."
+        )
+        return {**state, "intent": local.intent}
+    
+    llm = get_llm("router")
+    if supports_tools(llm):
+        # One call returns the intent together with the action's arguments
+        try:
+            decision = await call_with_schema(llm, "route", RouteDecision, [
+                SystemMessage(content=ROUTE_PROMPT.format(
+                    intents=INTENT_DESCRIPTIONS,
+                    current_time=user_now().isoformat()
+                )),
+                HumanMessage(content=user_message)
+            ])
+            intent_metrics.record(decision.intent, "llm", local_guess=local.intent if local else None)
+            logger.info(f"Detected intent: {decision.intent} (llm, structured) for message: {user_message[:50]}...")
+            return {**state, "intent": decision.intent, "slots": decision.slots()}
+        except Exception as e:
+            logger.warning(f"Structured routing failed, falling back to classification: {e}")
     
     try:
         response = await llm.ainvoke([
-            SystemMessage(content=system_prompt),
+            SystemMessage(content=CLASSIFY_PROMPT.format(intents=INTENT_DESCRIPTIONS)),
             HumanMessage(content=user_message)
         ])
         
         intent = response.content.strip().lower()
-        logger.info(f"Detected intent: {intent} for message: {user_message[:50]}...")
+        if intent not in INTENTS:
+            intent = "general"
+        intent_metrics.record(intent, "llm", local_guess=local.intent if local else None)
+        logger.info(f"Detected intent: {intent} (llm) for message: {user_message[:50]}...")
         
         return {**state, "intent": intent}
         
@@ -147,10 +174,10 @@ async def general_response_node(state: AgentState) -> AgentState:
         full_system_prompt += f"\n\nВАЖНЫЕ ИНСТРУКЦИИ ОТ ПОЛЬЗОВАТЕЛЯ:\n{user_system_prompt}"
     
     try:
-        response = await llm.ainvoke([
+        response = await get_llm("generator").ainvoke([
             SystemMessage(content=full_system_prompt),
             *messages
-        ])
+        ], stream_tokens=True)
         
         return {
             **state,
@@ -266,6 +293,7 @@ async def process_message(user_id: int, message: str, context: dict = None) -> s
         "messages": all_messages,
         "user_id": user_id,
         "intent": None,
+        "slots": None,
         "context": context or {},
     }
     
@@ -284,3 +312,45 @@ async def process_message(user_id: int, message: str, context: dict = None) -> s
     except Exception as e:
         logger.error(f"Error processing message: {e}", exc_info=True)
         return "Произошла ошибка при обработке вашего сообщения. Попробуйте позже."
+
+
+async def stream_message(user_id: int, message: str, context: dict = None) -> AsyncIterator[dict]:
+    """
+    Process a user message like process_message, yielding the answer as it is generated.
+    
+    Answer tokens of the final node are streamed (general conversation,
+    knowledge base and web search answers); other agents respond at once.
+    
+    Args:
+        user_id: Telegram user ID
+        message: User's message
+        context: Optional context dictionary
+        
+    Yields:
+        {"type": "token", "content": ...} per streamed piece of the answer, then
+        {"type": "done", "content": ...} with the full response, which replaces
+        the streamed text (an error may replace a partial answer)
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    sink = token_sink.set(queue)
+    try:
+        # The task (and the graph's node tasks) inherit the token sink
+        task = asyncio.create_task(process_message(user_id, message, context))
+    finally:
+        token_sink.reset(sink)
+    
+    try:
+        while True:
+            token = asyncio.ensure_future(queue.get())
+            await asyncio.wait({token, task}, return_when=asyncio.FIRST_COMPLETED)
+            if not token.done():
+                # Workflow finished and every token was delivered
+                token.cancel()
+                break
+            yield {"type": "token", "content": token.result()}
+        
+        yield {"type": "done", "content": task.result()}
+    finally:
+        if not task.done():
+            # Client went away
+            task.cancel()
@@ -1,14 +1,18 @@
 """Chat API endpoint."""
+import json
+
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from datetime import datetime
 
 from sqlalchemy import select, desc
 from db import get_db
+from db.session import async_session_factory
 from db.models import User, ConversationHistory, ChatSession
 from auth import get_current_user
-from agents.workflow import process_message
+from agents.workflow import process_message, stream_message
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
@@ -97,16 +101,12 @@ async def get_session_messages(
     ]
 
 
-@router.post("/message", response_model=MessageResponse)
-async def send_message(
-    request: MessageRequest,
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
-):
+async def prepare_message(request: MessageRequest, current_user: User, db: AsyncSession) -> tuple[int, dict]:
     """
-    Send a message to AI and get response.
+    Save the user's message (creating the session if needed) and build the workflow context.
     
-    Uses the agentic workflow to process the message.
+    Returns:
+        Session ID and workflow context
     """
     session_id = request.session_id
     
@@ -161,7 +161,6 @@ async def send_message(
         for msg in past_messages if msg.id != user_message.id
     ]
     
-    # Process through agentic workflow
     context = {
         "user_id": current_user.id,
         "telegram_id": current_user.telegram_id,
@@ -170,7 +169,23 @@ async def send_message(
         "chat_history": chat_history,
         "session_id": session_id
     }
+    return session_id, context
+
+
+@router.post("/message", response_model=MessageResponse)
+async def send_message(
+    request: MessageRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Send a message to AI and get response.
     
+    Uses the agentic workflow to process the message.
+    """
+    session_id, context = await prepare_message(request, current_user, db)
+    
+    # Process through agentic workflow
     response = await process_message(
         user_id=current_user.telegram_id,
         message=request.message,
@@ -188,3 +203,55 @@ async def send_message(
     await db.commit()
     
     return MessageResponse(message=response, session_id=session_id)
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format a server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/message/stream")
+async def stream_chat_message(
+    request: MessageRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Send a message to AI and stream the response as server-sent events.
+    
+    Events: ``session`` ({session_id}) first, ``token`` ({content}) per piece
+    of the answer, and ``done`` ({message, session_id}) with the full
+    response, which replaces the streamed text.
+    """
+    session_id, context = await prepare_message(request, current_user, db)
+    # The request's session is closed before the body is streamed
+    await db.commit()
+    user_id, telegram_id = current_user.id, current_user.telegram_id
+    
+    async def events():
+        yield sse_event("session", {"session_id": session_id})
+        async for event in stream_message(
+            user_id=telegram_id,
+            message=request.message,
+            context=context
+        ):
+            if event["type"] == "token":
+                yield sse_event("token", {"content": event["content"]})
+                continue
+            
+            # Save AI response
+            async with async_session_factory() as session:
+                session.add(ConversationHistory(
+                    user_id=user_id,
+                    session_id=session_id,
+                    role="assistant",
+                    content=event["content"]
+                ))
+                await session.commit()
+            yield sse_event("done", {"message": event["content"], "session_id": session_id})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
+import os
 import shutil
 from datetime import datetime
 from pydantic import BaseModel
@@ -11,6 +12,7 @@ from db.models import User, Document, Folder
 from auth import get_current_user
 from services.document_service import DocumentService
 from services.folder_service import FolderService
+from services.indexing_queue import IndexingQueue
 
 router = APIRouter(tags=["documents"])
 
@@ -44,20 +46,20 @@ async def list_documents(
         recursive=recursive
     )
 
-from fastapi import BackgroundTasks
-from services.rag_service import RAGService
-
-# ... imports ...
-
-async def background_index_document(document_id: int, db_session_maker):
-    """Background task for indexing document."""
-    async with db_session_maker() as db:
-        service = RAGService(db)
-        await service.index_document(document_id)
+class IndexingStatusResponse(BaseModel):
+    document_id: int
+    status: str
+    attempts: int
+    error: Optional[str]
+    queued_at: Optional[datetime]
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
 
 @router.post("/upload")
 async def upload_document(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     folder_id: Optional[int] = Form(None),
     current_user: User = Depends(get_current_user),
@@ -80,12 +82,39 @@ async def upload_document(
         folder_id=folder_id
     )
     
-    # Trigger indexing in background
-    # We need a new session for the background task
-    from db.session import async_session_maker
-    background_tasks.add_task(background_index_document, document.id, async_session_maker)
+    # Index in the Celery indexing queue, outside the API process
+    await IndexingQueue(db).enqueue(document.id)
+    
+    return {"message": "Document uploaded and queued for indexing", "document_id": document.id}
+
+@router.get("/{document_id}/indexing", response_model=IndexingStatusResponse)
+async def get_indexing_status(
+    document_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get the indexing queue status of a document."""
+    doc = await DocumentService(db).get_document(document_id)
+    if not doc or doc.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    job = await IndexingQueue(db).get_status(document_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Document was never queued for indexing")
+    return job
+
+@router.post("/{document_id}/reindex", response_model=IndexingStatusResponse)
+async def reindex_document(
+    document_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Queue a document for re-indexing (no-op if it is already queued)."""
+    doc = await DocumentService(db).get_document(document_id)
+    if not doc or doc.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Document not found")
     
-    return {"message": "Document uploaded and indexing started", "document_id": document.id}
+    return await IndexingQueue(db).enqueue(document_id)
 
 class DocumentUpdate(BaseModel):
     folder_id: Optional[int] = None
@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from db import get_db
-from db.models import User
+from db.models import Document, User
 from auth import get_current_user
+from services.indexing_queue import IndexingQueue
 from services.rag_service import RAGService
 
 router = APIRouter(tags=["knowledge"])
@@ -16,6 +17,14 @@ class SearchResult(BaseModel):
     document_id: Optional[int]
     filename: str
 
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=20)
+    limit: int = Field(5, ge=1, le=50)
+
+class BatchSearchResult(BaseModel):
+    query: str
+    results: List[SearchResult]
+
 @router.get("/search", response_model=List[SearchResult])
 async def search_knowledge_base(
     q: str = Query(..., min_length=1, description="Search query"),
@@ -27,13 +36,38 @@ async def search_knowledge_base(
     Search the knowledge base for relevant document chunks.
     """
     rag_service = RAGService(db)
-    results = rag_service.search(
+    results = await rag_service.search(
         query=q,
         user_id=current_user.id,
         limit=limit
     )
     return results
 
+@router.post("/search/batch", response_model=List[BatchSearchResult])
+async def search_knowledge_base_batch(
+    request: BatchSearchRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Search the knowledge base for several queries at once.
+    
+    All queries are embedded in one request and searched in one Qdrant batch.
+    """
+    if any(not query.strip() for query in request.queries):
+        raise HTTPException(status_code=422, detail="Queries must not be empty")
+    
+    rag_service = RAGService(db)
+    results = await rag_service.search_batch(
+        queries=request.queries,
+        user_id=current_user.id,
+        limit=request.limit
+    )
+    return [
+        {"query": query, "results": query_results}
+        for query, query_results in zip(request.queries, results)
+    ]
+
 @router.post("/index/{document_id}")
 async def index_document(
     document_id: int,
@@ -41,12 +75,11 @@ async def index_document(
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Manually trigger indexing for a document.
+    Manually trigger indexing for a document (queued, see GET /api/documents/{id}/indexing).
     """
-    rag_service = RAGService(db)
-    success = await rag_service.index_document(document_id)
+    document = await db.get(Document, document_id)
+    if not document or document.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Document not found")
     
-    if not success:
-        raise HTTPException(status_code=500, detail="Failed to index document")
-        
-    return {"message": "Document indexed successfully"}
+    job = await IndexingQueue(db).enqueue(document_id)
+    return {"message": "Document queued for indexing", "status": job.status}
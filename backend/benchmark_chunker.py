@@ -0,0 +1,75 @@
+"""Compare the token-aware chunker with the old character splitter on local files.
+
+Usage:
+    python benchmark_chunker.py /app/uploads/yandex_disk/1 [more paths...]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from config import settings
+from services.chunker import TokenChunker
+from services.context_builder import get_encoding
+from services.text_extraction import extract_text, shutdown_extraction_pool
+
+SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".doc", ".txt", ".md"}
+
+
+def iter_files(paths):
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for root, _, files in os.walk(path):
+            for name in files:
+                if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                    yield os.path.join(root, name)
+
+
+def describe(name, chunks, elapsed, encoding):
+    sizes = [len(encoding.encode(chunk)) for chunk in chunks] or [0]
+    print(
+        f"  {name:<10} chunks={len(chunks):<6} tokens={sum(sizes):<8} "
+        f"avg={statistics.mean(sizes):<7.1f} max={max(sizes):<6} "
+        f"batches={-(-sum(sizes) // 250000) or 0:<3} time={elapsed * 1000:.1f}ms"
+    )
+    return len(chunks), sum(sizes), elapsed
+
+
+async def main(paths):
+    encoding = get_encoding(settings.openai_embedding_model)
+    totals = {"splitter": [0, 0, 0.0], "chunker": [0, 0, 0.0]}
+
+    for file_path in iter_files(paths):
+        text = await extract_text(file_path, os.path.basename(file_path))
+        if not text:
+            continue
+        print(f"{file_path} ({len(text)} chars)")
+
+        started = time.perf_counter()
+        splitter_chunks = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_text(text)
+        result = describe("splitter", splitter_chunks, time.perf_counter() - started, encoding)
+        totals["splitter"] = [a + b for a, b in zip(totals["splitter"], result)]
+
+        started = time.perf_counter()
+        markdown = file_path.lower().endswith(".md")
+        chunker_chunks = [c.text for c in TokenChunker(markdown=markdown).split_text(text)]
+        result = describe("chunker", chunker_chunks, time.perf_counter() - started, encoding)
+        totals["chunker"] = [a + b for a, b in zip(totals["chunker"], result)]
+
+    print("\nTotals:")
+    for name, (chunks, tokens, elapsed) in totals.items():
+        print(f"  {name:<10} chunks={chunks:<6} tokens={tokens:<8} time={elapsed:.2f}s")
+
+    shutdown_extraction_pool()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,96 @@
+"""Measure the local intent classifier on held-out messages to calibrate its thresholds.
+
+Reports rule precision and, for the n-gram model, precision and coverage
+of messages it would route without the LLM at each threshold/margin pair.
+
+Usage:
+    python benchmark_intent_classifier.py
+"""
+from agents.intent_classifier import ACTION_INTENTS, _model, is_decisive, match_rules, classify_intent
+from config import settings
+
+# Messages not in the training set, including near misses of each intent
+HELD_OUT = [
+    ("task", "добавь задачу забрать посылку"),
+    ("task", "покажи список дел на неделю"),
+    ("task", "отметь выполненной задачу про отчет"),
+    ("task", "удали задачу 7"),
+    ("task", "запиши что надо купить корм коту"),
+    ("calendar", "поставь встречу с юристом на вторник в 11"),
+    ("calendar", "что у меня запланировано на пятницу"),
+    ("calendar", "созвон с Олегом завтра в 18:00"),
+    ("calendar", "перенеси созвон на среду"),
+    ("reminder", "напомни через час проверить почту"),
+    ("reminder", "не забудь мне сказать про оплату аренды в пятницу"),
+    ("reminder", "поставь напоминалку на 7 утра"),
+    ("image", "нарисуй закат в горах"),
+    ("image", "сгенерируй аватарку для телеграма"),
+    ("image", "изобрази дракона в стиле акварели"),
+    ("document", "сохрани этот файл"),
+    ("document", "проиндексируй документ который я загрузил"),
+    ("knowledge", "что написано в моем договоре аренды про залог"),
+    ("knowledge", "найди в моих документах номер полиса"),
+    ("knowledge", "какие сроки указаны в техническом задании"),
+    ("knowledge", "что в моих заметках про рецепт пирога"),
+    ("knowledge", "когда дедлайн проекта по документам"),
+    ("search", "найди информацию о компании Яндекс"),
+    ("search", "какие встречи были у Путина"),
+    ("search", "какие задачи решает машинное обучение"),
+    ("search", "сколько стоит билет до Казани"),
+    ("search", "новости спорта за сегодня"),
+    ("search", "что такое квантовый компьютер"),
+    ("search", "кто выиграл чемпионат мира по футболу"),
+    ("search", "лучшие рестораны в Санкт-Петербурге"),
+    ("search", "как приготовить плов"),
+    ("search", "курс евро к рублю"),
+    ("general", "как дела"),
+    ("general", "спасибо большое"),
+    ("general", "ты кто такой"),
+    ("general", "расскажи шутку"),
+    ("general", "доброй ночи"),
+    ("general", "что ты можешь"),
+    ("general", "мне скучно"),
+    ("general", "как тебя зовут"),
+]
+
+THRESHOLDS = (0.8, 0.85, 0.9, 0.95, 0.97)
+MARGINS = (0.6, 0.8, 0.9, 0.95)
+
+
+def main():
+    rule_hits = rule_correct = 0
+    model_predictions = []
+    for expected, text in HELD_OUT:
+        rule = match_rules(text)
+        if rule and rule.confidence >= settings.intent_local_threshold:
+            rule_hits += 1
+            rule_correct += rule.intent == expected
+            continue
+        prediction = _model.predict(text)
+        if prediction and prediction.intent not in ACTION_INTENTS:
+            model_predictions.append((expected, text, prediction))
+
+    print(f"Held-out messages: {len(HELD_OUT)}")
+    print(f"Rules: {rule_hits} decided, precision {rule_correct / max(rule_hits, 1):.2f}")
+    print(f"Model (non-action intents): {len(model_predictions)} candidates")
+    print(f"  {'threshold':>9} {'margin':>6} {'routed':>6} {'precision':>9}")
+    for threshold in THRESHOLDS:
+        for margin in MARGINS:
+            routed = [
+                (expected, p) for expected, _, p in model_predictions
+                if p.confidence >= threshold and p.margin >= margin
+            ]
+            correct = sum(expected == p.intent for expected, p in routed)
+            precision = correct / len(routed) if routed else 1.0
+            print(f"  {threshold:>9.2f} {margin:>6.2f} {len(routed):>6} {precision:>9.2f}")
+
+    print("\nDecided locally with current settings:")
+    for expected, text in HELD_OUT:
+        prediction = classify_intent(text)
+        if is_decisive(prediction):
+            mark = "ok " if prediction.intent == expected else "ERR"
+            print(f"  {mark} {prediction.intent:<9} {prediction.source:<5} {prediction.confidence:.2f} {text}")
+
+
+if __name__ == "__main__":
+    main()
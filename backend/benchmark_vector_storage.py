@@ -0,0 +1,201 @@
+"""Compare Qdrant storage modes on a sample of the live documents collection.
+
+For every mode a temporary collection is built with ``create_collection``
+(the production multitenant layout, quantization and on-disk settings)
+from the same sampled points. Queries are held-out vectors that are not
+in the collections, searched with their owner's user filter like real
+searches. Switching a quantized collection back to float32 in place (as
+``migrate_collection_layout`` does) is checked at the end. Recall@k is measured against exact float32 search at full
+dimensionality; reduced dimensions are simulated by truncating and
+re-normalizing (equivalent to the text-embedding-3 ``dimensions`` option).
+RAM is estimated from vector counts (originals in RAM unless on disk,
+plus quantized vectors which are always kept in RAM).
+
+Usage:
+    python benchmark_vector_storage.py [--sample 5000] [--queries 100] [--limit 10] [--dims 1536,512]
+"""
+import argparse
+import math
+import random
+import statistics
+import time
+from contextlib import contextmanager
+
+from qdrant_client.models import FieldCondition, Filter, MatchValue, PointStruct, SearchParams
+
+from config import settings
+from services.rag_service import (
+    COLLECTION_ALIAS,
+    apply_storage_settings,
+    create_collection,
+    ensure_collection,
+    get_qdrant_client,
+    get_search_params,
+)
+
+# name, quantization, originals on disk
+MODES = [
+    ("float32", "none", False),
+    ("int8", "scalar", False),
+    ("int8+disk", "scalar", True),
+    ("binary+disk", "binary", True),
+]
+
+
+@contextmanager
+def storage_mode(quantization, on_disk):
+    """Temporarily switch the storage settings read by create_collection and get_search_params."""
+    saved = settings.qdrant_quantization, settings.qdrant_vectors_on_disk
+    settings.qdrant_quantization, settings.qdrant_vectors_on_disk = quantization, on_disk
+    try:
+        yield
+    finally:
+        settings.qdrant_quantization, settings.qdrant_vectors_on_disk = saved
+
+
+def estimate_ram_mb(count, dims, mode, on_disk):
+    originals = 0 if on_disk else count * dims * 4
+    quantized = {"scalar": count * dims, "binary": count * dims / 8}.get(mode, 0)
+    return (originals + quantized) / 1024 / 1024
+
+
+def truncate(vector, dims):
+    head = vector[:dims]
+    norm = math.sqrt(sum(x * x for x in head)) or 1.0
+    return [x / norm for x in head]
+
+
+def sample_points(client, sample):
+    points = []
+    offset = None
+    while len(points) < sample:
+        records, offset = client.scroll(
+            collection_name=COLLECTION_ALIAS,
+            limit=min(256, sample - len(points)),
+            offset=offset,
+            with_vectors=True,
+            with_payload=True
+        )
+        points.extend(records)
+        if offset is None:
+            break
+    return points
+
+
+def wait_until_indexed(client, name, timeout=600):
+    started = time.time()
+    while time.time() - started < timeout:
+        if client.get_collection(name).status == "green":
+            return
+        time.sleep(1)
+
+
+def build(client, name, points, dims):
+    client.delete_collection(name)  # leftover from an interrupted run
+    # Build HNSW even for a small sample so ANN (not full scan) is measured
+    create_collection(client, name, dims, indexing_threshold=1)
+    for i in range(0, len(points), 256):
+        client.upsert(
+            collection_name=name,
+            points=[
+                PointStruct(id=p.id, vector=truncate(p.vector, dims), payload=p.payload)
+                for p in points[i:i + 256]
+            ]
+        )
+    wait_until_indexed(client, name)
+
+
+def run_queries(client, name, queries, dims, limit, params):
+    latencies, results = [], []
+    for query in queries:
+        user_filter = Filter(must=[FieldCondition(key="user_id", match=MatchValue(value=query.payload["user_id"]))])
+        started = time.perf_counter()
+        hits = client.search(
+            collection_name=name,
+            query_vector=truncate(query.vector, dims),
+            query_filter=user_filter,
+            search_params=params,
+            limit=limit
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append([str(hit.id) for hit in hits])
+    return latencies, results
+
+
+def check_quantization_removal(client, points, dims):
+    """Build an int8 collection, switch it to "none" in place and verify quantization is gone."""
+    name = "bench_unquantize"
+    with storage_mode("scalar", False):
+        build(client, name, points, dims)
+    try:
+        with storage_mode("none", False):
+            apply_storage_settings(client, name)
+        wait_until_indexed(client, name)
+        removed = client.get_collection(name).config.quantization_config is None
+        print(f"\nint8 -> none in place: quantization {'removed' if removed else 'STILL ENABLED'}")
+    finally:
+        client.delete_collection(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sample", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--dims", default="")
+    parser.add_argument("--oversampling", type=float, default=2.0)
+    args = parser.parse_args()
+    settings.qdrant_quantization_oversampling = args.oversampling
+
+    ensure_collection()
+    client = get_qdrant_client()
+    sampled = [p for p in sample_points(client, args.sample + args.queries) if (p.payload or {}).get("user_id")]
+    random.shuffle(sampled)
+    # Held-out queries: vectors that are not in the benchmarked collections
+    queries, points = sampled[:args.queries], sampled[args.queries:]
+    indexed_users = {p.payload["user_id"] for p in points}
+    queries = [q for q in queries if q.payload["user_id"] in indexed_users]
+    if not points or not queries:
+        print("Not enough points to benchmark.")
+        return
+
+    full_dims = len(points[0].vector)
+    dims_list = [int(d) for d in args.dims.split(",") if d] or [full_dims]
+    print(
+        f"Sampled {len(points)} points ({full_dims} dims, {len(indexed_users)} users), "
+        f"{len(queries)} held-out queries, k={args.limit}\n"
+    )
+
+    # Ground truth: exact search at full dimensionality
+    truth_name = "bench_truth"
+    with storage_mode("none", False):
+        build(client, truth_name, points, full_dims)
+    _, truth = run_queries(client, truth_name, queries, full_dims, args.limit, SearchParams(exact=True))
+
+    print(f"{'mode':<14}{'dims':>6}{'RAM MB':>10}{'p50 ms':>9}{'p95 ms':>9}{'recall':>9}")
+    try:
+        for dims in dims_list:
+            for mode_name, mode, on_disk in MODES:
+                name = f"bench_{mode_name.replace('+', '_')}_{dims}"
+                with storage_mode(mode, on_disk):
+                    build(client, name, points, dims)
+                    params = get_search_params()
+                latencies, results = run_queries(client, name, queries, dims, args.limit, params)
+                recall = statistics.mean(
+                    len(set(got) & set(expected)) / max(len(expected), 1)
+                    for got, expected in zip(results, truth)
+                )
+                latencies.sort()
+                print(
+                    f"{mode_name:<14}{dims:>6}{estimate_ram_mb(len(points), dims, mode, on_disk):>10.1f}"
+                    f"{statistics.median(latencies):>9.2f}{latencies[int(len(latencies) * 0.95) - 1]:>9.2f}"
+                    f"{recall:>9.3f}"
+                )
+                client.delete_collection(name)
+        check_quantization_removal(client, points, full_dims)
+    finally:
+        client.delete_collection(truth_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 """Celery application for background tasks."""
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_init, worker_process_init, worker_shutdown
 from config import settings
 
 # Create Celery app
@@ -22,6 +23,16 @@ celery_app.conf.update(
     task_soft_time_limit=3000,  # 50 minutes
     broker_heartbeat=0,  # Disable heartbeat to prevent connection drops
     broker_connection_retry_on_startup=True,
+    # Indexing runs on its own queue; Redis serves priority 0 first
+    task_routes={"tasks.index_document": {"queue": "indexing"}},
+    broker_transport_options={
+        "priority_steps": list(range(10)),
+        "queue_order_strategy": "priority",
+        # Unacked (acks_late) messages are redelivered after this; keep it above
+        # task_time_limit so a running job isn't handed to a second worker
+        "visibility_timeout": 7200,
+    },
+    worker_prefetch_multiplier=1,  # Long tasks: don't let one worker hoard queued jobs
 )
 
 # Periodic tasks schedule
@@ -38,6 +49,14 @@ celery_app.conf.beat_schedule = {
         'task': 'tasks.send_daily_digest',
         'schedule': crontab(minute=0, hour=6),  # 06:00 UTC -> 09:00 MSK Every day
     },
+    'prune-embedding-cache': {
+        'task': 'tasks.prune_embedding_cache',
+        'schedule': crontab(minute=30, hour=3),  # Every day at 03:30 UTC
+    },
+    'reconcile-vector-index': {
+        'task': 'tasks.reconcile_index',
+        'schedule': crontab(minute=0, hour=4),  # Every day at 04:00 UTC
+    },
 }
 
 # Explicitly import tasks
@@ -45,4 +64,34 @@ celery_app.conf.imports = [
     'tasks.reminders',
     'tasks.cloud_sync_tasks',
     'tasks.daily_digest',
+    'tasks.index_maintenance',
+    'tasks.indexing',
 ]
+
+
+def _runs_tasks_in_main_process(worker) -> bool:
+    """Solo and thread pools run tasks in the worker's main process (the indexing worker)."""
+    pool = str(getattr(worker, "pool_cls", ""))
+    return "solo" in pool or "thread" in pool
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """Bootstrap shared per-process clients once for each worker process."""
+    from services.rag_service import ensure_collection
+    ensure_collection()
+
+
+@worker_init.connect
+def init_worker(sender=None, **kwargs):
+    """Same bootstrap for pools without child processes, where worker_process_init never fires."""
+    if _runs_tasks_in_main_process(sender):
+        from services.rag_service import ensure_collection
+        ensure_collection()
+
+
+@worker_shutdown.connect
+def shutdown_worker(**kwargs):
+    """Stop the text extraction pool of the indexing worker."""
+    from services.text_extraction import shutdown_extraction_pool
+    shutdown_extraction_pool()
@@ -17,12 +17,21 @@ class Settings(BaseSettings):
     telegram_bot_token: str
     telegram_webhook_url: Optional[str] = None
     telegram_webhook_secret: Optional[str] = None
+    telegram_stream_interval: float = 1.0  # seconds between edits of a streamed answer (Telegram rate limits)
     
     # OpenAI
     openai_api_key: str
     openai_model: str = "gpt-4-turbo-preview"
+    openai_fast_model: str = "gpt-4o-mini"  # classification, extraction, query rewriting
     openai_embedding_model: str = "text-embedding-3-small"
     
+    # Embeddings backend: "openai" or "local" (sentence-transformers on CPU)
+    embedding_backend: str = "openai"
+    embedding_dimensions: Optional[int] = None  # Reduced output size (text-embedding-3), defaults to the model's native size
+    local_embedding_model: str = "intfloat/multilingual-e5-base"  # 512-token context; chunks are capped to the model's limit
+    local_embedding_batch_size: int = 32
+    local_embedding_threads: int = 4
+    
     # Database
     database_url: str
     database_pool_size: int = 20
@@ -35,6 +44,63 @@ class Settings(BaseSettings):
     qdrant_url: str = "http://localhost:6333"
     qdrant_api_key: Optional[str] = None
     qdrant_collection_name: str = "knowledge_base"
+    # Vector storage: quantization "none", "scalar" (int8) or "binary"; originals can live on disk
+    qdrant_quantization: str = "none"
+    qdrant_quantization_oversampling: float = 2.0
+    qdrant_vectors_on_disk: bool = False
+    qdrant_payload_on_disk: bool = False
+    
+    # Embedding cache (Postgres, keyed by model + chunk text hash)
+    embedding_cache_enabled: bool = True
+    embedding_cache_max_entries: int = 500000
+    
+    # Embedding request dispatch (adaptive to 429s)
+    embedding_concurrency: int = 4
+    embedding_batch_inputs: int = 2048  # inputs per request (API max 2048)
+    embedding_batch_tokens: int = 250000  # tokens per request, below the API's 300k
+    index_window_inputs: int = 1024  # chunks embedded and upserted together while indexing; bounds memory per document
+    embedding_max_retries: int = 5
+    
+    # Query embeddings: LRU+TTL cache and micro-batching of concurrent queries
+    query_embedding_cache_size: int = 2048
+    query_embedding_cache_ttl: int = 3600  # seconds
+    query_embedding_batch_window_ms: int = 5
+    query_embedding_max_batch: int = 64
+    
+    # Hybrid retrieval: Postgres full-text results fused with vector results
+    rag_hybrid_search: bool = True
+    rag_rrf_k: int = 60  # reciprocal rank fusion constant
+    rag_lexical_fast_path_terms: int = 4  # identifier queries (digits, quotes, codes) up to this many terms may skip embedding; 0 disables
+    
+    # Semantic answer cache of the RAG agent (per user, in Redis)
+    rag_answer_cache_enabled: bool = True
+    rag_answer_cache_threshold: float = 0.95  # cosine similarity of query embeddings
+    rag_answer_cache_ttl: int = 86400  # seconds
+    rag_answer_cache_max_entries: int = 200  # per user
+    
+    # Indexing queue (Celery queue "indexing")
+    indexing_max_retries: int = 3
+    indexing_retry_backoff: int = 60  # seconds, doubled per attempt
+    
+    # Re-embedding into a shadow collection (see tasks.reembed_collection)
+    qdrant_alias_cache_ttl: int = 30  # seconds a process keeps its resolved alias target
+    reembed_concurrency: int = 2  # embedding requests in flight, below embedding_concurrency
+    reembed_page_size: int = 512  # chunks per checkpoint
+    reembed_time_budget: int = 2400  # seconds per task run before it checkpoints and requeues
+    
+    # Local intent classifier in front of the LLM router (agents/intent_classifier.py)
+    intent_local_enabled: bool = True
+    intent_local_threshold: float = 0.85  # keyword rules below this fall back to the LLM
+    intent_model_threshold: float = 0.95  # n-gram model: minimum confidence...
+    intent_model_margin: float = 0.9  # ...and lead over the runner-up (never for task/calendar/reminder)
+    
+    # Chunking (sizes in embedding model tokens)
+    chunk_tokens: int = 300
+    chunk_overlap_tokens: int = 50
+    
+    # RAG prompt context
+    rag_search_limit: int = 8  # Chunks retrieved before merging and packing
+    rag_context_max_tokens: int = 3000
     
     # Application
     secret_key: str
@@ -46,6 +112,11 @@ class Settings(BaseSettings):
     upload_dir: str = "/app/uploads"
     max_upload_size: int = 104857600  # 100MB
     
+    # Text extraction (process pool)
+    extraction_workers: int = 2
+    extraction_timeout: int = 120  # seconds per file
+    extraction_max_memory_mb: int = 1024  # per worker process
+    
     # Celery
     celery_broker_url: str = "redis://localhost:6379/0"
     celery_result_backend: str = "redis://localhost:6379/1"
@@ -54,6 +125,24 @@ class Settings(BaseSettings):
     use_ollama: bool = Field(default=False)
     ollama_base_url: str = Field(default="http://localhost:11434")
     ollama_model: str = Field(default="dolphin-mixtral")
+    ollama_fast_model: Optional[str] = None  # defaults to ollama_model
+    
+    # Model per LLM role (services/llm_gateway.py); unset roles use the fast
+    # model (router, extractor) or the main model (generator, digest)
+    llm_router_model: Optional[str] = None
+    llm_extractor_model: Optional[str] = None
+    llm_generator_model: Optional[str] = None
+    llm_digest_model: Optional[str] = None
+    
+    # LLM gateway: timeouts, retries, circuit breaker, concurrency (per process)
+    llm_timeout: float = 60.0  # seconds per call of generator/digest
+    llm_fast_timeout: float = 15.0  # seconds per call of router/extractor
+    llm_max_retries: int = 2  # transient errors: timeouts, connection errors, 429, 5xx
+    llm_retry_backoff: float = 0.5  # seconds, doubled per attempt, with full jitter
+    llm_circuit_failures: int = 5  # consecutive failures that open a model's circuit
+    llm_circuit_reset: float = 30.0  # seconds before trial calls are let through
+    llm_max_concurrency: int = 8  # calls in flight per event loop
+    llm_max_connections: int = 20  # pooled HTTP connections to the OpenAI API
     
     # DALL-E Image Generation
     dalle_model: str = Field(default="dall-e-3")
@@ -10,6 +10,9 @@ from db.models import (
     Document,
     Folder,
     KnowledgeBase,
+    EmbeddingCacheEntry,
+    VectorCollection,
+    IndexingJob,
     ConversationHistory,
 )
 
@@ -27,5 +30,8 @@ __all__ = [
     "Document",
     "Folder",
     "KnowledgeBase",
+    "EmbeddingCacheEntry",
+    "VectorCollection",
+    "IndexingJob",
     "ConversationHistory",
 ]
@@ -1,9 +1,9 @@
 """Database models using SQLAlchemy ORM."""
 from datetime import datetime
-from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Boolean, ForeignKey, JSON, Float, func
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, Boolean, ForeignKey, JSON, Float, LargeBinary, Computed, Index, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
 
 Base = declarative_base()
 
@@ -176,11 +176,64 @@ class KnowledgeBase(Base):
     content = Column(Text, nullable=False)
     content_type = Column(String(50), default="document")  # document, conversation, manual
     meta_data = Column(JSON, nullable=True)  # Renamed from metadata (SQLAlchemy reserved)
-    vector_id = Column(String(255), nullable=True)  # ID in Qdrant
+    vector_id = Column(String(255), nullable=True, unique=True, index=True)  # ID in Qdrant
+    # Full-text vector for lexical search ('simple': no stemming, works for any language and identifiers)
+    content_tsv = Column(TSVECTOR, Computed("to_tsvector('simple', content)", persisted=True))
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
     document = relationship("Document", back_populates="knowledge_entries")
+    
+    __table_args__ = (
+        Index("ix_knowledge_base_content_tsv", "content_tsv", postgresql_using="gin"),
+    )
+
+
+class IndexingJob(Base):
+    """Indexing queue state, one row per document (the deduplication key)."""
+    __tablename__ = "indexing_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), unique=True, nullable=False)
+    status = Column(String(20), default="queued", index=True)  # queued, processing, done, failed
+    priority = Column(Integer, default=0)  # Celery priority, 0 is most urgent
+    attempts = Column(Integer, default=0)
+    rerun = Column(Boolean, default=False)  # Re-requested while processing
+    task_token = Column(String(32), nullable=True)  # Token of the task message allowed to run the job
+    notify_telegram_id = Column(BigInteger, nullable=True)  # Chat to notify when done
+    error = Column(Text, nullable=True)
+    queued_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class VectorCollection(Base):
+    """Versioned Qdrant collections built by the re-embedding job."""
+    __tablename__ = "vector_collections"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(255), unique=True, nullable=False)
+    embedding_backend = Column(String(50), nullable=False)  # openai, local
+    embedding_model = Column(String(255), nullable=False)
+    dimensions = Column(Integer, nullable=True)  # Shortened output size (text-embedding-3 only)
+    vector_size = Column(Integer, nullable=False)
+    status = Column(String(20), default="building")  # building, active, retired
+    checkpoint = Column(Integer, default=0)  # Last knowledge_base.id embedded
+    previous_collection = Column(String(255), nullable=True)  # Alias target replaced on activation
+    created_at = Column(DateTime, default=datetime.utcnow)
+    activated_at = Column(DateTime, nullable=True)
+
+
+class EmbeddingCacheEntry(Base):
+    """Cached chunk embeddings keyed by embedding model and chunk text hash."""
+    __tablename__ = "embedding_cache"
+    
+    model = Column(String(100), primary_key=True)
+    text_hash = Column(String(64), primary_key=True)  # SHA-256 of chunk text
+    dimensions = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # Packed float32 array
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
 
 
 class ChatSession(Base):
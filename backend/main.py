@@ -1,11 +1,13 @@
 """Main FastAPI application."""
+import asyncio
 import logging
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request, Response
+from fastapi import Depends, FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from aiogram.types import Update
 
+from auth import get_current_admin_user
 from config import settings
 from db import init_db
 from telegram.bot import bot, dp, on_startup, on_shutdown
@@ -18,6 +20,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Seconds startup waits for the Qdrant collection bootstrap
+VECTOR_STORE_STARTUP_TIMEOUT = 10
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -27,6 +32,15 @@ async def lifespan(app: FastAPI):
     await init_db()
     logger.info("Database initialized")
     
+    # Bootstrap the collection off the event loop; a slow or unreachable Qdrant
+    # doesn't hold up startup, RAGService retries on first use
+    from services.rag_service import ensure_collection
+    try:
+        if await asyncio.wait_for(asyncio.to_thread(ensure_collection), VECTOR_STORE_STARTUP_TIMEOUT):
+            logger.info("Vector store initialized")
+    except asyncio.TimeoutError:
+        logger.warning("Vector store not ready at startup, will retry on first use")
+    
     # Register Telegram handlers
     dp.include_router(basic.router)
     dp.include_router(messages.router)
@@ -41,6 +55,9 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down AI Jarvis application...")
     await on_shutdown()
+    
+    from services.text_extraction import shutdown_extraction_pool
+    shutdown_extraction_pool()
 
 
 # Create FastAPI application
@@ -77,6 +94,20 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics/intents", dependencies=[Depends(get_current_admin_user)])
+async def intent_metrics_endpoint():
+    """Intent routing counts and local classifier hit rate (this process)."""
+    from agents.intent_classifier import intent_metrics
+    return intent_metrics.snapshot()
+
+
+@app.get("/metrics/llm", dependencies=[Depends(get_current_admin_user)])
+async def llm_metrics_endpoint():
+    """LLM calls, latency, tokens and estimated cost per role (this process)."""
+    from services.llm_gateway import llm_metrics
+    return llm_metrics.snapshot()
+
+
 @app.post("/webhook/tg")
 async def telegram_webhook(request: Request):
     """
@@ -0,0 +1,97 @@
+"""Move chunk texts from Qdrant payloads into the knowledge_base table.
+
+Adds the unique index on knowledge_base.vector_id and the full-text
+column with its GIN index, copies text/heading of every point that still
+carries them into Postgres, then strips text, heading and filename from
+the payloads. Points whose document no longer exists are left alone.
+Safe to run repeatedly.
+"""
+import asyncio
+import logging
+
+from sqlalchemy import select, text
+
+from db.models import Document
+from db.session import async_session_factory
+from services.chunk_store import ChunkStore
+from services.rag_service import COLLECTION_ALIAS, ensure_collection, get_async_qdrant_client
+
+logging.basicConfig(level=logging.INFO)
+
+SLIMMED_KEYS = ["text", "heading", "filename"]
+PAGE_SIZE = 256
+
+
+async def migrate():
+    client = get_async_qdrant_client()
+    async with async_session_factory() as session:
+        print("Creating unique index on knowledge_base.vector_id...")
+        await session.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_knowledge_base_vector_id ON knowledge_base (vector_id);"
+        ))
+        print("Adding full-text column and GIN index to knowledge_base...")
+        await session.execute(text(
+            "ALTER TABLE knowledge_base ADD COLUMN IF NOT EXISTS content_tsv tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED;"
+        ))
+        await session.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_knowledge_base_content_tsv ON knowledge_base USING gin (content_tsv);"
+        ))
+        await session.commit()
+
+        store = ChunkStore(session)
+        moved = skipped = 0
+        offset = None
+        while True:
+            records, offset = await client.scroll(
+                collection_name=COLLECTION_ALIAS,
+                with_payload=True,
+                with_vectors=False,
+                limit=PAGE_SIZE,
+                offset=offset
+            )
+            records = [r for r in records if r.payload and "text" in r.payload]
+            if records:
+                document_ids = {r.payload.get("document_id") for r in records}
+                result = await session.execute(select(Document.id).where(Document.id.in_(document_ids)))
+                known = {row.id for row in result}
+
+                rows = []
+                for record in records:
+                    payload = record.payload
+                    if payload.get("document_id") not in known:
+                        skipped += 1
+                        continue
+                    rows.append({
+                        "vector_id": str(record.id),
+                        "document_id": payload["document_id"],
+                        "content": payload["text"],
+                        "meta_data": {
+                            "chunk_index": payload.get("chunk_index"),
+                            "heading": payload.get("heading"),
+                            "text_hash": payload.get("text_hash"),
+                        },
+                    })
+
+                if rows:
+                    await store.upsert(rows)
+                    await session.commit()
+                    # Only strip payloads once the texts are safely in Postgres
+                    await client.delete_payload(
+                        collection_name=COLLECTION_ALIAS,
+                        keys=SLIMMED_KEYS,
+                        points=[row["vector_id"] for row in rows]
+                    )
+                    moved += len(rows)
+                    print(f"Moved {moved} chunks...")
+
+            if offset is None:
+                break
+
+        print(f"Moved {moved} chunks to Postgres, skipped {skipped} points of deleted documents.")
+
+
+if __name__ == "__main__":
+    ensure_collection()
+    asyncio.run(migrate())
+    print("Chunk store migration complete.")
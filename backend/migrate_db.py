@@ -52,6 +52,13 @@ async def migrate():
             await session.execute(text("CREATE INDEX IF NOT EXISTS ix_chat_sessions_id ON chat_sessions(id);"))
         except Exception as e:
             print(f"Notice (chat sessions): {e}")
+
+        # 5. Task message token of indexing jobs
+        print("Adding task_token to indexing_jobs...")
+        try:
+            await session.execute(text("ALTER TABLE indexing_jobs ADD COLUMN IF NOT EXISTS task_token VARCHAR(32);"))
+        except Exception as e:
+            print(f"Notice (indexing jobs): {e}")
             
         await session.commit()
         print("Migration complete.")
@@ -0,0 +1,14 @@
+"""Migrate the Qdrant documents collection to the multitenant layout.
+
+Adds payload indexes on user_id (tenant), document_id and file_type, and
+switches HNSW to per-user graphs. Safe to run repeatedly.
+"""
+import logging
+
+from services.rag_service import migrate_collection_layout
+
+logging.basicConfig(level=logging.INFO)
+
+if __name__ == "__main__":
+    migrate_collection_layout()
+    print("Qdrant migration complete.")
@@ -0,0 +1,36 @@
+"""Re-embed the knowledge base into a new collection without downtime.
+
+Queues the Celery job that embeds all stored chunks with the given model
+into a new versioned collection and then switches the served alias to it.
+Searches keep using the current collection until the switch. Run
+migrate_chunk_store.py first if documents were indexed before chunk
+texts were stored in Postgres.
+
+Usage:
+    python reembed_collection.py --backend openai --model text-embedding-3-large [--dimensions 1024]
+    python reembed_collection.py --resume <collection_id>
+"""
+import argparse
+
+from celery_app import celery_app  # noqa: F401 - configures the broker for .delay()
+from tasks.index_maintenance import reembed_collection
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["openai", "local"], default="openai")
+    parser.add_argument("--model")
+    parser.add_argument("--dimensions", type=int)
+    parser.add_argument("--resume", type=int, help="Continue building an existing collection")
+    args = parser.parse_args()
+
+    if args.resume:
+        result = reembed_collection.delay(collection_id=args.resume)
+    elif args.model:
+        result = reembed_collection.delay(
+            embedding_backend=args.backend,
+            embedding_model=args.model,
+            embedding_dimensions=args.dimensions
+        )
+    else:
+        parser.error("--model or --resume is required")
+    print(f"Queued re-embedding task {result.id}")
@@ -0,0 +1,147 @@
+"""Per-user semantic cache of RAG answers, stored in Redis."""
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import math
+import time
+import weakref
+from array import array
+from typing import List, Optional
+
+from redis.asyncio import Redis
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Redis clients own a connection pool bound to one loop; keep one per event loop
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Redis]" = weakref.WeakKeyDictionary()
+
+
+def get_redis() -> Redis:
+    """Get the Redis client of the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = Redis.from_url(settings.redis_url)
+        _clients[loop] = client
+    return client
+
+
+def _version_key(user_id: int) -> str:
+    return f"rag_answers:{user_id}:version"
+
+
+def _entries_key(user_id: int, version: int) -> str:
+    return f"rag_answers:{user_id}:{version}"
+
+
+def _pack(vector: List[float]) -> str:
+    return base64.b64encode(array("f", vector).tobytes()).decode("ascii")
+
+
+def _unpack(data: str) -> List[float]:
+    vector = array("f")
+    vector.frombytes(base64.b64decode(data))
+    return vector.tolist()
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class AnswerCache:
+    """
+    Answers to a user's knowledge base questions, matched by query embedding.
+
+    Entries live in a Redis hash per user and knowledge base version. Any
+    re-index or delete of the user's documents bumps the version, so cached
+    answers are never served against a changed knowledge base - even when
+    the change happens in another process. An answer generated while the
+    knowledge base changed is written under the old version and never read.
+
+    Redis errors are logged and treated as misses.
+    """
+
+    def __init__(self, user_id: int):
+        """Initialize cache for a user."""
+        self.user_id = user_id
+        self.version: Optional[int] = None
+
+    async def lookup(self, query_vector: List[float]) -> Optional[str]:
+        """
+        Find a cached answer to a semantically equivalent question.
+
+        Also pins the knowledge base version that a following ``store`` uses.
+
+        Args:
+            query_vector: Embedding of the question
+
+        Returns:
+            Cached answer, or None on a miss
+        """
+        try:
+            redis = get_redis()
+            self.version = int(await redis.get(_version_key(self.user_id)) or 0)
+            entries = await redis.hvals(_entries_key(self.user_id, self.version))
+        except Exception as e:
+            logger.warning(f"Answer cache lookup failed: {e}")
+            return None
+
+        best_score, best_answer = 0.0, None
+        expired_before = time.time() - settings.rag_answer_cache_ttl
+        for raw in entries:
+            entry = json.loads(raw)
+            if entry["created_at"] < expired_before:
+                continue
+            score = _cosine(query_vector, _unpack(entry["vector"]))
+            if score > best_score:
+                best_score, best_answer = score, entry["answer"]
+
+        if best_score >= settings.rag_answer_cache_threshold:
+            logger.info(f"Answer cache hit for user {self.user_id} (similarity {best_score:.3f})")
+            return best_answer
+        return None
+
+    async def store(self, query: str, query_vector: List[float], answer: str) -> None:
+        """Cache an answer under the version pinned by the preceding ``lookup``."""
+        if self.version is None:
+            return
+        key = _entries_key(self.user_id, self.version)
+        field = hashlib.sha256(query.encode("utf-8")).hexdigest()
+        entry = json.dumps({
+            "query": query,
+            "vector": _pack(query_vector),
+            "answer": answer,
+            "created_at": time.time(),
+        })
+        try:
+            redis = get_redis()
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.hset(key, field, entry)
+                pipe.expire(key, settings.rag_answer_cache_ttl)
+                pipe.hlen(key)
+                _, _, size = await pipe.execute()
+            if size > settings.rag_answer_cache_max_entries:
+                await self._evict_oldest(key, size - settings.rag_answer_cache_max_entries)
+        except Exception as e:
+            logger.warning(f"Answer cache store failed: {e}")
+
+    async def _evict_oldest(self, key: str, count: int) -> None:
+        entries = await get_redis().hgetall(key)
+        oldest = sorted(entries.items(), key=lambda item: json.loads(item[1])["created_at"])
+        await get_redis().hdel(key, *[field for field, _ in oldest[:count]])
+
+
+async def invalidate_user_answers(user_id: int) -> None:
+    """Drop all cached answers of a user after their knowledge base changed."""
+    try:
+        redis = get_redis()
+        version = await redis.incr(_version_key(user_id))
+        await redis.delete(_entries_key(user_id, version - 1))
+    except Exception as e:
+        logger.warning(f"Answer cache invalidation for user {user_id} failed: {e}")
@@ -0,0 +1,190 @@
+"""Postgres store of indexed chunk texts, keyed by Qdrant point ID."""
+import logging
+import re
+from datetime import datetime
+from typing import Dict, Iterable, List, Set
+
+from sqlalchemy import delete, func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import Document, KnowledgeBase
+
+logger = logging.getLogger(__name__)
+
+# Keep IN (...) lists and multi-row inserts well below Postgres bind parameter limits
+BATCH_SIZE = 1000
+
+# Text search configuration of knowledge_base.content_tsv
+TS_CONFIG = literal_column("'simple'::regconfig")
+
+# The 'simple' configuration keeps stopwords, so any-term queries drop them
+# themselves; otherwise "в", "и" or "что" match nearly every chunk
+STOPWORDS = frozenset("""
+    а без бы был была были было в вам вас во вот все всё где да для до его ее её если есть еще ещё же за
+    и из или им их к как ко когда кто ли меня мне мной мое моё мои мой моя мы на над не нет ни но ну
+    о об однако он она они оно от по под при про с со так также такой там то тоже только том ты у уже
+    чем что чтобы эта эти это этот я
+    a an and are as at be by for from how in is it of on or that the this to was what when where which who with
+""".split())
+
+# Terms of an any-term query, after dropping stopwords
+MAX_ANY_TERMS = 8
+
+
+class ChunkStore:
+    """
+    Chunk texts of indexed documents in the ``knowledge_base`` table.
+
+    Qdrant only keeps vectors plus IDs and filter fields; the text, heading
+    and source document of each point live here under ``vector_id``, so
+    search results are hydrated from Postgres and the vector index can be
+    rebuilt without re-extracting files.
+    """
+
+    def __init__(self, db: AsyncSession):
+        """Initialize store."""
+        self.db = db
+
+    async def get_vector_ids(self, document_id: int) -> Set[str]:
+        """Point IDs that have a stored chunk for a document."""
+        result = await self.db.execute(
+            select(KnowledgeBase.vector_id).where(KnowledgeBase.document_id == document_id)
+        )
+        return {row.vector_id for row in result}
+
+    async def upsert(self, rows: List[dict]) -> None:
+        """
+        Insert or replace chunks.
+
+        Args:
+            rows: Dicts with vector_id, document_id, content and meta_data
+                (chunk_index, heading, text_hash)
+        """
+        now = datetime.utcnow()
+        for i in range(0, len(rows), BATCH_SIZE):
+            stmt = insert(KnowledgeBase).values([
+                {**row, "content_type": "document", "created_at": now}
+                for row in rows[i:i + BATCH_SIZE]
+            ])
+            await self.db.execute(stmt.on_conflict_do_update(
+                index_elements=[KnowledgeBase.vector_id],
+                set_={
+                    "document_id": stmt.excluded.document_id,
+                    "content": stmt.excluded.content,
+                    "meta_data": stmt.excluded.meta_data,
+                }
+            ))
+
+    async def delete(self, vector_ids: Iterable[str]) -> None:
+        """Delete chunks by point ID."""
+        ids = list(vector_ids)
+        for i in range(0, len(ids), BATCH_SIZE):
+            await self.db.execute(
+                delete(KnowledgeBase).where(KnowledgeBase.vector_id.in_(ids[i:i + BATCH_SIZE]))
+            )
+
+    async def delete_document(self, document_id: int) -> None:
+        """Delete all chunks of a document."""
+        await self.db.execute(delete(KnowledgeBase).where(KnowledgeBase.document_id == document_id))
+
+    async def lexical_search(
+        self,
+        query: str,
+        user_id: int,
+        limit: int,
+        match_all: bool = True
+    ) -> List[dict]:
+        """
+        Full-text search over a user's chunks using the GIN index.
+
+        Runs in a savepoint; failures are logged and return no results so
+        vector search is unaffected.
+
+        Args:
+            query: Search query (plain text)
+            user_id: User ID to filter by
+            limit: Number of results
+            match_all: Require every query term (otherwise any term except
+                stopwords matches)
+
+        Returns:
+            Results shaped like ``RAGService.search`` results, best rank first
+        """
+        if match_all:
+            tsquery = func.plainto_tsquery(TS_CONFIG, query)
+        else:
+            terms = [t for t in dict.fromkeys(re.findall(r"\w+", query.lower())) if t not in STOPWORDS]
+            if not terms:
+                return []
+            tsquery = func.plainto_tsquery(TS_CONFIG, terms[0])
+            for term in terms[1:MAX_ANY_TERMS]:
+                tsquery = tsquery.op("||")(func.plainto_tsquery(TS_CONFIG, term))
+        rank = func.ts_rank_cd(KnowledgeBase.content_tsv, tsquery)
+
+        try:
+            async with self.db.begin_nested():
+                result = await self.db.execute(
+                    select(
+                        KnowledgeBase.content,
+                        KnowledgeBase.meta_data,
+                        KnowledgeBase.document_id,
+                        Document.original_filename,
+                        rank.label("rank")
+                    )
+                    .join(Document, Document.id == KnowledgeBase.document_id)
+                    .where(
+                        Document.user_id == user_id,
+                        KnowledgeBase.content_tsv.op("@@")(tsquery)
+                    )
+                    .order_by(rank.desc())
+                    .limit(limit)
+                )
+                rows = result.all()
+        except Exception as e:
+            logger.warning(f"Lexical search failed: {e}")
+            return []
+
+        return [
+            {
+                "text": row.content,
+                "score": float(row.rank),
+                "document_id": row.document_id,
+                "filename": row.original_filename,
+                "chunk_index": (row.meta_data or {}).get("chunk_index"),
+            }
+            for row in rows
+        ]
+
+    async def hydrate(self, vector_ids: Iterable[str]) -> Dict[str, dict]:
+        """
+        Fetch chunk texts for search hits in one query.
+
+        Args:
+            vector_ids: Qdrant point IDs
+
+        Returns:
+            Mapping of point ID -> dict with text, heading and filename
+        """
+        ids = list(dict.fromkeys(vector_ids))
+        if not ids:
+            return {}
+
+        result = await self.db.execute(
+            select(
+                KnowledgeBase.vector_id,
+                KnowledgeBase.content,
+                KnowledgeBase.meta_data,
+                Document.original_filename
+            )
+            .join(Document, Document.id == KnowledgeBase.document_id)
+            .where(KnowledgeBase.vector_id.in_(ids))
+        )
+        return {
+            row.vector_id: {
+                "text": row.content,
+                "heading": (row.meta_data or {}).get("heading"),
+                "filename": row.original_filename,
+            }
+            for row in result
+        }
@@ -0,0 +1,204 @@
+"""Token-aware, markdown/heading-aware text chunker for document indexing."""
+import re
+from typing import AsyncIterator, Iterable, Iterator, List, NamedTuple, Optional
+
+from config import settings
+from services.context_builder import get_encoding
+
+# Buffered characters before a streaming split at a paragraph boundary
+STREAM_BUFFER_CHARS = 20000
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+_PARAGRAPH_RE = re.compile(r"(\n\s*\n)")
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+")
+
+
+class TextChunk(NamedTuple):
+    """A chunk of document text with its token count and markdown section."""
+    text: str
+    tokens: int
+    heading: Optional[str]
+
+
+class _Unit(NamedTuple):
+    text: str
+    tokens: int
+
+
+class TokenChunker:
+    """
+    Split text into chunks measured in embedding-model tokens.
+
+    Text is cut on paragraph boundaries first, then sentences, and only
+    falls back to hard token cuts for oversized sentences. In markdown mode
+    every heading starts a new chunk and the heading path ("A / B") is kept
+    with each chunk. Consecutive chunks within a section overlap by up to
+    ``overlap_tokens`` of whole paragraphs/sentences, so overlaps are verbatim.
+
+    The chunker is stateful while streaming; use a new instance per document.
+    """
+
+    def __init__(
+        self,
+        chunk_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None,
+        markdown: bool = False,
+        model: Optional[str] = None,
+        encoding=None
+    ):
+        """
+        Initialize chunker (defaults from settings).
+
+        ``encoding`` is any object with ``encode``/``decode`` (e.g. the local
+        model's tokenizer, see LocalEmbeddings.encoding); without it tokens
+        are counted with tiktoken for ``model``.
+        """
+        self.chunk_tokens = chunk_tokens or settings.chunk_tokens
+        self.overlap_tokens = overlap_tokens if overlap_tokens is not None else settings.chunk_overlap_tokens
+        self.markdown = markdown
+        self.encoding = encoding or get_encoding(model or settings.openai_embedding_model)
+
+        self._units: List[_Unit] = []
+        self._tokens = 0
+        self._headings: List[str] = []
+        self._heading: Optional[str] = None
+
+    def split_text(self, text: str) -> List[TextChunk]:
+        """Split a complete text into chunks."""
+        chunks = list(self._feed(text))
+        chunks.extend(self._flush())
+        return chunks
+
+    async def stream(self, segments: AsyncIterator[str]) -> AsyncIterator[TextChunk]:
+        """
+        Chunk text as it arrives.
+
+        Segments are buffered and cut at the last paragraph break, so chunk
+        boundaries don't depend on how extraction segmented the text. Text
+        without blank lines (typical for PDFs) is cut at a line break once
+        the buffer grows past a few times the normal size.
+        """
+        buffer = ""
+        async for segment in segments:
+            buffer += segment
+            if len(buffer) < STREAM_BUFFER_CHARS:
+                continue
+            cut = buffer.rfind("\n\n")
+            if cut > 0:
+                cut += 2
+            elif len(buffer) >= 4 * STREAM_BUFFER_CHARS:
+                cut = buffer.rfind("\n") + 1
+            if cut <= 0:
+                continue
+            head, buffer = buffer[:cut], buffer[cut:]
+            for chunk in self._feed(head):
+                yield chunk
+
+        for chunk in self._feed(buffer):
+            yield chunk
+        for chunk in self._flush():
+            yield chunk
+
+    # --- internals ---
+
+    def _count(self, text: str) -> int:
+        return len(self.encoding.encode(text))
+
+    def _feed(self, text: str) -> Iterator[TextChunk]:
+        for block in self._blocks(text):
+            heading = self._match_heading(block)
+            if heading:
+                # A new section: close the current chunk without overlap
+                yield from self._flush()
+                level, title = heading
+                self._headings = self._headings[:level - 1] + [title]
+                self._heading = " / ".join(self._headings)
+            for unit in self._units_of(block):
+                yield from self._add(unit)
+
+    def _blocks(self, text: str) -> Iterable[str]:
+        """Paragraphs (keeping their trailing blank line); headings become their own block."""
+        parts = _PARAGRAPH_RE.split(text)
+        for i in range(0, len(parts), 2):
+            paragraph = parts[i] + (parts[i + 1] if i + 1 < len(parts) else "")
+            if not paragraph:
+                continue
+            if not self.markdown:
+                yield paragraph
+                continue
+            # Headings may be glued to the paragraph that follows them
+            lines = paragraph.splitlines(keepends=True)
+            current = ""
+            for line in lines:
+                if _HEADING_RE.match(line.strip()):
+                    if current:
+                        yield current
+                    yield line
+                    current = ""
+                else:
+                    current += line
+            if current:
+                yield current
+
+    def _match_heading(self, block: str) -> Optional[tuple]:
+        if not self.markdown:
+            return None
+        match = _HEADING_RE.match(block.strip())
+        if not match:
+            return None
+        return len(match.group(1)), match.group(2)
+
+    def _units_of(self, block: str) -> Iterator[_Unit]:
+        """Break a block into units no larger than the chunk size."""
+        tokens = self._count(block)
+        if tokens <= self.chunk_tokens:
+            yield _Unit(block, tokens)
+            return
+
+        for sentence in self._split_keep(block, _SENTENCE_RE):
+            sentence_tokens = self.encoding.encode(sentence)
+            if len(sentence_tokens) <= self.chunk_tokens:
+                yield _Unit(sentence, len(sentence_tokens))
+                continue
+            # Hard cut on token boundaries
+            for start in range(0, len(sentence_tokens), self.chunk_tokens):
+                piece = sentence_tokens[start:start + self.chunk_tokens]
+                yield _Unit(self.encoding.decode(piece), len(piece))
+
+    @staticmethod
+    def _split_keep(text: str, pattern: re.Pattern) -> List[str]:
+        """Split text after each match, keeping separators attached to the left piece."""
+        pieces = []
+        last = 0
+        for match in pattern.finditer(text):
+            pieces.append(text[last:match.end()])
+            last = match.end()
+        if last < len(text):
+            pieces.append(text[last:])
+        return pieces
+
+    def _add(self, unit: _Unit) -> Iterator[TextChunk]:
+        if self._units and self._tokens + unit.tokens > self.chunk_tokens:
+            yield from self._emit()
+            # Carry whole trailing units into the next chunk as overlap
+            overlap = []
+            overlap_tokens = 0
+            for previous in reversed(self._units):
+                if overlap_tokens + previous.tokens > self.overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_tokens += previous.tokens
+            if overlap_tokens + unit.tokens > self.chunk_tokens:
+                overlap, overlap_tokens = [], 0
+            self._units, self._tokens = overlap, overlap_tokens
+        self._units.append(unit)
+        self._tokens += unit.tokens
+
+    def _emit(self) -> Iterator[TextChunk]:
+        text = "".join(u.text for u in self._units).strip()
+        if text:
+            yield TextChunk(text=text, tokens=self._tokens, heading=self._heading)
+
+    def _flush(self) -> Iterator[TextChunk]:
+        yield from self._emit()
+        self._units, self._tokens = [], 0
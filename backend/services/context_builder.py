@@ -0,0 +1,135 @@
+"""Token-budgeted assembly of retrieved chunks into an LLM prompt context."""
+import logging
+import re
+from functools import lru_cache
+from typing import List, Optional
+
+import tiktoken
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Passages whose word shingles are mostly contained in an already packed one are dropped
+NEAR_DUPLICATE_THRESHOLD = 0.8
+# Longest overlap searched for when stitching consecutive chunks (chunk overlap is ~50 tokens)
+MAX_STITCH_OVERLAP = 600
+# Don't bother packing a truncated passage smaller than this
+MIN_PASSAGE_TOKENS = 50
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> tiktoken.Encoding:
+    """Get the tokenizer for a model, falling back to cl100k_base."""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def _stitch(left: str, right: str) -> str:
+    """Join two consecutive chunks, removing the splitter overlap between them."""
+    limit = min(len(left), len(right), MAX_STITCH_OVERLAP)
+    for size in range(limit, 0, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return left + "\n" + right
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+
+
+def _merge_adjacent(results: List[dict]) -> List[dict]:
+    """Merge hits from the same document with consecutive chunk indexes into passages."""
+    by_document = {}
+    for result in results:
+        by_document.setdefault(result.get("document_id"), []).append(result)
+
+    passages = []
+    for hits in by_document.values():
+        hits.sort(key=lambda r: (r.get("chunk_index") is None, r.get("chunk_index") or 0))
+        current = None
+        for hit in hits:
+            index = hit.get("chunk_index")
+            if (
+                current is not None
+                and index is not None
+                and current["last_index"] is not None
+                and index == current["last_index"] + 1
+            ):
+                current["text"] = _stitch(current["text"], hit["text"])
+                current["score"] = max(current["score"], hit["score"])
+                current["last_index"] = index
+                continue
+            current = {
+                "text": hit["text"],
+                "score": hit["score"],
+                "filename": hit.get("filename", ""),
+                "document_id": hit.get("document_id"),
+                "last_index": index,
+            }
+            passages.append(current)
+
+    passages.sort(key=lambda p: p["score"], reverse=True)
+    return passages
+
+
+def build_context(
+    results: List[dict],
+    max_tokens: Optional[int] = None,
+    model: Optional[str] = None
+) -> str:
+    """
+    Pack search results into a prompt context within a token budget.
+
+    Consecutive chunks of a document are stitched into one passage (dropping
+    the splitter overlap), near-duplicate passages are skipped, and passages
+    are added best-score first until the budget is reached.
+
+    Args:
+        results: Search results from ``RAGService.search``
+        max_tokens: Token budget (default ``settings.rag_context_max_tokens``)
+        model: Model whose tokenizer is used (default chat model)
+
+    Returns:
+        Context text, empty if there is nothing to pack
+    """
+    max_tokens = max_tokens or settings.rag_context_max_tokens
+    encoding = get_encoding(model or settings.openai_model)
+
+    blocks = []
+    packed_shingles = []
+    used = 0
+
+    for passage in _merge_adjacent(results):
+        shingles = _shingles(passage["text"])
+        if any(
+            len(shingles & other) / max(len(shingles), 1) >= NEAR_DUPLICATE_THRESHOLD
+            for other in packed_shingles
+        ):
+            continue
+
+        header = f"Document: {passage['filename']}\nContent: "
+        header_tokens = len(encoding.encode(header))
+        text_tokens = encoding.encode(passage["text"])
+        remaining = max_tokens - used - header_tokens
+
+        if len(text_tokens) > remaining:
+            if remaining < MIN_PASSAGE_TOKENS:
+                continue
+            text = encoding.decode(text_tokens[:remaining])
+            used += header_tokens + remaining
+        else:
+            text = passage["text"]
+            used += header_tokens + len(text_tokens)
+
+        blocks.append(header + text)
+        packed_shingles.append(shingles)
+
+        if max_tokens - used < MIN_PASSAGE_TOKENS:
+            break
+
+    logger.debug(f"Packed {len(blocks)} passages into {used}/{max_tokens} context tokens")
+    return "\n\n".join(blocks)
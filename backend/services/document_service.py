@@ -8,6 +8,9 @@ from sqlalchemy import select
 
 from db.models import Document, User
 from config import settings
+from services.answer_cache import invalidate_user_answers
+from services.chunk_store import ChunkStore
+from services.rag_service import RAGService
 
 
 class DocumentService:
@@ -147,6 +150,10 @@ class DocumentService:
         if os.path.exists(document.file_path):
             os.remove(document.file_path)
         
+        await RAGService(self.db).delete_document_points(document.id)
+        # Bulk delete instead of letting the ORM cascade load every chunk
+        await ChunkStore(self.db).delete_document(document.id)
         await self.db.delete(document)
         await self.db.commit()
+        await invalidate_user_answers(document.user_id)
         return True
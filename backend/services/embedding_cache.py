@@ -0,0 +1,151 @@
+"""Persistent cache of chunk embeddings keyed by embedding model and chunk text hash."""
+import hashlib
+import logging
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+from sqlalchemy import select, update, delete, func, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import EmbeddingCacheEntry
+
+logger = logging.getLogger(__name__)
+
+# Keep IN (...) lists well below Postgres bind parameter limits
+LOOKUP_BATCH_SIZE = 1000
+
+
+def text_hash(text: str) -> str:
+    """Content address of a chunk."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _pack(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(data: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(data)
+    return vector.tolist()
+
+
+class EmbeddingCache:
+    """
+    Chunk embedding cache stored in the ``embedding_cache`` table.
+
+    Lookups and writes run inside savepoints so a cache failure never
+    aborts the caller's transaction - indexing just falls back to the API.
+    """
+
+    def __init__(self, db: AsyncSession, model: str):
+        """Initialize cache for a given embedding model."""
+        self.db = db
+        self.model = model
+
+    async def get_many(self, hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """
+        Fetch cached vectors and mark them as recently used.
+
+        Args:
+            hashes: Chunk text hashes (see ``text_hash``)
+
+        Returns:
+            Mapping of hash -> vector for the hashes that were found
+        """
+        unique = list(dict.fromkeys(hashes))
+        found: Dict[str, List[float]] = {}
+
+        try:
+            async with self.db.begin_nested():
+                for i in range(0, len(unique), LOOKUP_BATCH_SIZE):
+                    batch = unique[i:i + LOOKUP_BATCH_SIZE]
+                    result = await self.db.execute(
+                        select(EmbeddingCacheEntry.text_hash, EmbeddingCacheEntry.vector).where(
+                            EmbeddingCacheEntry.model == self.model,
+                            EmbeddingCacheEntry.text_hash.in_(batch)
+                        )
+                    )
+                    hit_hashes = []
+                    for row in result:
+                        found[row.text_hash] = _unpack(row.vector)
+                        hit_hashes.append(row.text_hash)
+
+                    if hit_hashes:
+                        await self.db.execute(
+                            update(EmbeddingCacheEntry)
+                            .where(
+                                EmbeddingCacheEntry.model == self.model,
+                                EmbeddingCacheEntry.text_hash.in_(hit_hashes)
+                            )
+                            .values(last_used_at=datetime.utcnow())
+                        )
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            return {}
+
+        return found
+
+    async def put_many(self, vectors: Dict[str, List[float]]) -> None:
+        """
+        Store freshly computed vectors.
+
+        Args:
+            vectors: Mapping of chunk text hash -> vector
+        """
+        if not vectors:
+            return
+
+        now = datetime.utcnow()
+        rows = [
+            {
+                "model": self.model,
+                "text_hash": h,
+                "dimensions": len(vector),
+                "vector": _pack(vector),
+                "created_at": now,
+                "last_used_at": now,
+            }
+            for h, vector in vectors.items()
+        ]
+
+        try:
+            async with self.db.begin_nested():
+                # 6 columns per row, stay under the 32767 bind parameter limit
+                for i in range(0, len(rows), LOOKUP_BATCH_SIZE):
+                    stmt = insert(EmbeddingCacheEntry).values(rows[i:i + LOOKUP_BATCH_SIZE])
+                    await self.db.execute(stmt.on_conflict_do_nothing())
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    async def prune(self, max_entries: int) -> int:
+        """
+        Evict least recently used entries (across all models) above ``max_entries``.
+
+        Returns:
+            Number of evicted entries
+        """
+        total = await self.db.scalar(select(func.count()).select_from(EmbeddingCacheEntry))
+        if not total or total <= max_entries:
+            return 0
+
+        # Exactly the oldest rows by primary key order; a timestamp cutoff would also
+        # evict every row tied with it (a batch upsert shares one last_used_at)
+        oldest = (
+            select(EmbeddingCacheEntry.model, EmbeddingCacheEntry.text_hash)
+            .order_by(
+                EmbeddingCacheEntry.last_used_at,
+                EmbeddingCacheEntry.model,
+                EmbeddingCacheEntry.text_hash
+            )
+            .limit(total - max_entries)
+        )
+        result = await self.db.execute(
+            delete(EmbeddingCacheEntry).where(
+                tuple_(EmbeddingCacheEntry.model, EmbeddingCacheEntry.text_hash).in_(oldest)
+            )
+        )
+        await self.db.commit()
+        return result.rowcount or 0
@@ -0,0 +1,174 @@
+"""Concurrent, rate-limit aware dispatch of embedding batches."""
+import asyncio
+import logging
+import random
+import weakref
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+from config import settings
+from services.context_builder import get_encoding
+
+logger = logging.getLogger(__name__)
+
+# Backoff bounds in seconds (full jitter below the exponential cap)
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+
+# Per-request limits of the OpenAI embeddings API
+MAX_REQUEST_INPUTS = 2048
+MAX_REQUEST_TOKENS = 300000
+
+# Limiters use asyncio primitives bound to one loop; keep one per event loop
+_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AdaptiveConcurrencyLimiter]" = weakref.WeakKeyDictionary()
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limiter shared by all embedding requests of a process.
+
+    The limit is halved whenever the API answers 429 and grows back by one
+    after a limit's worth of consecutive successes, up to ``max_concurrency``.
+    """
+
+    def __init__(self, max_concurrency: int):
+        """Initialize limiter at full concurrency."""
+        self.max_concurrency = max(max_concurrency, 1)
+        self.limit = self.max_concurrency
+        self.active = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        """Additive increase after a run of successful requests."""
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.max_concurrency:
+            self.limit += 1
+            self._successes = 0
+
+    def on_rate_limited(self):
+        """Multiplicative decrease on 429."""
+        self._successes = 0
+        if self.limit > 1:
+            self.limit = max(1, self.limit // 2)
+            logger.warning(f"Embeddings rate limited, concurrency reduced to {self.limit}")
+
+
+def get_limiter() -> AdaptiveConcurrencyLimiter:
+    """Get the embedding limiter of the running event loop."""
+    loop = asyncio.get_running_loop()
+    limiter = _limiters.get(loop)
+    if limiter is None:
+        limiter = AdaptiveConcurrencyLimiter(settings.embedding_concurrency)
+        _limiters[loop] = limiter
+    return limiter
+
+
+def _retry_after(error: RateLimitError) -> Optional[float]:
+    """Seconds to wait as requested by the API, if it said so."""
+    try:
+        value = error.response.headers.get("retry-after")
+        return float(value) if value else None
+    except (AttributeError, ValueError):
+        return None
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+async def _embed_batch(
+    embeddings: Embeddings,
+    texts: List[str],
+    limiter: AdaptiveConcurrencyLimiter
+) -> List[List[float]]:
+    """Embed one batch, retrying rate limits and transient API errors."""
+    attempt = 0
+    while True:
+        try:
+            async with limiter:
+                vectors = await embeddings.aembed_documents(texts)
+            limiter.on_success()
+            return vectors
+        except RateLimitError as e:
+            limiter.on_rate_limited()
+            if attempt >= settings.embedding_max_retries:
+                raise
+            delay = _retry_after(e) or _backoff(attempt)
+        except (APITimeoutError, APIConnectionError, InternalServerError) as e:
+            if attempt >= settings.embedding_max_retries:
+                raise
+            delay = _backoff(attempt)
+            logger.warning(f"Embeddings request failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+def pack_batches(texts: List[str], token_counts: List[int]) -> List[List[str]]:
+    """
+    Pack texts in order into requests of up to ``settings.embedding_batch_tokens``
+    tokens and ``settings.embedding_batch_inputs`` inputs (both clamped to the API limits).
+    """
+    max_inputs = min(max(settings.embedding_batch_inputs, 1), MAX_REQUEST_INPUTS)
+    max_tokens = min(settings.embedding_batch_tokens, MAX_REQUEST_TOKENS)
+    batches, batch, batch_tokens = [], [], 0
+    for text, tokens in zip(texts, token_counts):
+        if batch and (len(batch) >= max_inputs or batch_tokens + tokens > max_tokens):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(text)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+async def embed_documents(
+    embeddings: Embeddings,
+    texts: List[str],
+    limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+    token_counts: Optional[List[int]] = None
+) -> List[List[float]]:
+    """
+    Embed texts as concurrent requests packed up to the per-request token and input limits.
+
+    Parallelism is capped by the process-wide adaptive limiter, so several
+    documents indexing at once share the same budget.
+
+    Args:
+        embeddings: Embedding backend
+        texts: Texts to embed
+        limiter: Separate limiter for throttled background jobs (default: process-wide)
+        token_counts: Tokens of each text (e.g. ``TextChunk.tokens``); counted
+            with tiktoken if not given
+
+    Returns:
+        Vectors in the same order as ``texts``
+    """
+    if not texts:
+        return []
+
+    if token_counts is None:
+        encoding = get_encoding(getattr(embeddings, "model", None) or settings.openai_embedding_model)
+        token_counts = [len(encoding.encode(text)) for text in texts]
+    limiter = limiter or get_limiter()
+    batches = pack_batches(texts, token_counts)
+    results = await asyncio.gather(*(_embed_batch(embeddings, batch, limiter) for batch in batches))
+
+    vectors = []
+    for batch_vectors in results:
+        vectors.extend(batch_vectors)
+    return vectors
@@ -0,0 +1,125 @@
+"""Consistency repair between Postgres documents and Qdrant points."""
+import asyncio
+import logging
+from typing import Dict
+
+from qdrant_client.models import FieldCondition, Filter, MatchValue, PointIdsList
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import Document
+from services.answer_cache import invalidate_user_answers
+from services.indexing_queue import PRIORITY_BACKGROUND, IndexingQueue
+from services.rag_service import get_active_collection, get_async_qdrant_client
+
+logger = logging.getLogger(__name__)
+
+# Points scrolled and documents checked per page; memory stays bounded by these
+POINT_PAGE_SIZE = 1000
+DOCUMENT_PAGE_SIZE = 500
+# Concurrent per-document point counts (served by the document_id payload index)
+COUNT_CONCURRENCY = 16
+
+
+class IndexReconciler:
+    """
+    Finds and repairs drift between the documents table and the vector index.
+
+    - Points whose document no longer exists are deleted.
+    - Documents flagged ``is_indexed`` without any points are flagged as not
+      indexed and queued for re-indexing at background priority.
+
+    Both sides are walked in pages, so memory doesn't grow with the size of
+    the index.
+    """
+
+    def __init__(self, db: AsyncSession):
+        """Initialize reconciler."""
+        self.db = db
+        self.client = get_async_qdrant_client()
+
+    async def run(self) -> Dict[str, int]:
+        """
+        Reconcile the served collection with Postgres.
+
+        Returns:
+            Repair counts: orphaned_points, unindexed_documents
+        """
+        collection_name = (await get_active_collection(self.db)).name
+        orphaned = await self._delete_orphaned_points(collection_name)
+        unindexed = await self._unflag_documents_without_points(collection_name)
+        logger.info(
+            f"Reconciled {collection_name}: {orphaned} orphaned points deleted, "
+            f"{unindexed} documents without points unflagged"
+        )
+        return {"orphaned_points": orphaned, "unindexed_documents": unindexed}
+
+    async def _delete_orphaned_points(self, collection_name: str) -> int:
+        deleted = 0
+        offset = None
+        while True:
+            records, offset = await self.client.scroll(
+                collection_name=collection_name,
+                with_payload=["document_id", "user_id"],
+                with_vectors=False,
+                limit=POINT_PAGE_SIZE,
+                offset=offset
+            )
+            if records:
+                document_ids = {(r.payload or {}).get("document_id") for r in records} - {None}
+                result = await self.db.execute(select(Document.id).where(Document.id.in_(document_ids)))
+                existing = {row.id for row in result}
+
+                orphans = [r for r in records if (r.payload or {}).get("document_id") not in existing]
+                if orphans:
+                    await self.client.delete(
+                        collection_name=collection_name,
+                        points_selector=PointIdsList(points=[r.id for r in orphans])
+                    )
+                    deleted += len(orphans)
+                    # Orphans may have shown up in cached answers
+                    for user_id in {(r.payload or {}).get("user_id") for r in orphans} - {None}:
+                        await invalidate_user_answers(user_id)
+            if offset is None:
+                return deleted
+
+    async def _unflag_documents_without_points(self, collection_name: str) -> int:
+        semaphore = asyncio.Semaphore(COUNT_CONCURRENCY)
+
+        async def has_points(document_id: int) -> bool:
+            async with semaphore:
+                result = await self.client.count(
+                    collection_name=collection_name,
+                    count_filter=Filter(must=[
+                        FieldCondition(key="document_id", match=MatchValue(value=document_id))
+                    ]),
+                    exact=True
+                )
+                return result.count > 0
+
+        unflagged = 0
+        last_id = 0
+        while True:
+            result = await self.db.execute(
+                select(Document.id)
+                .where(Document.is_indexed.is_(True), Document.id > last_id)
+                .order_by(Document.id)
+                .limit(DOCUMENT_PAGE_SIZE)
+            )
+            document_ids = [row.id for row in result]
+            if not document_ids:
+                return unflagged
+            last_id = document_ids[-1]
+
+            present = await asyncio.gather(*(has_points(document_id) for document_id in document_ids))
+            missing = [document_id for document_id, found in zip(document_ids, present) if not found]
+            if missing:
+                await self.db.execute(
+                    update(Document).where(Document.id.in_(missing)).values(is_indexed=False)
+                )
+                await self.db.commit()
+                unflagged += len(missing)
+                logger.warning(f"Documents flagged as indexed without points: {missing}")
+                queue = IndexingQueue(self.db)
+                for document_id in missing:
+                    await queue.enqueue(document_id, priority=PRIORITY_BACKGROUND)
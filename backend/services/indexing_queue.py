@@ -0,0 +1,201 @@
+"""Durable, deduplicated document indexing queue on top of Celery."""
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+from uuid import uuid4
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from celery_app import celery_app
+from config import settings
+from db.models import IndexingJob
+
+logger = logging.getLogger(__name__)
+
+INDEXING_QUEUE = "indexing"
+INDEX_TASK_NAME = "tasks.index_document"
+
+# Celery priorities on the Redis broker: 0 is served first
+PRIORITY_INTERACTIVE = 0  # User is waiting (web upload, Telegram)
+PRIORITY_SYNC = 5  # Cloud storage sync
+PRIORITY_BACKGROUND = 9  # Maintenance re-indexing
+
+
+class IndexingQueue:
+    """
+    Indexing queue with per-document deduplication and status tracking.
+
+    Each document has one ``indexing_jobs`` row. Enqueueing a document that
+    is already queued doesn't send another task (it may only raise the
+    priority); enqueueing one that is being indexed marks it for a rerun
+    once the current run finishes, so the latest file is always indexed.
+
+    Every task message carries a token that is stored on the row; only the
+    message with the current token may run the job. Superseded messages
+    are skipped, while a redelivery of the current message (its worker
+    died mid-run) takes the job over.
+    """
+
+    def __init__(self, db: AsyncSession):
+        """Initialize queue."""
+        self.db = db
+
+    async def enqueue(
+        self,
+        document_id: int,
+        priority: int = PRIORITY_INTERACTIVE,
+        notify_telegram_id: Optional[int] = None
+    ) -> IndexingJob:
+        """
+        Queue a document for indexing.
+
+        Args:
+            document_id: Document ID
+            priority: Celery priority (0 is most urgent)
+            notify_telegram_id: Telegram chat to notify when indexing finishes
+
+        Returns:
+            The document's indexing job
+        """
+        await self.db.execute(
+            insert(IndexingJob)
+            .values(document_id=document_id, status="new", priority=priority)
+            .on_conflict_do_nothing(index_elements=[IndexingJob.document_id])
+        )
+        # Row lock serializes concurrent enqueues of the same document
+        job = await self.db.scalar(
+            select(IndexingJob).where(IndexingJob.document_id == document_id).with_for_update()
+        )
+        if notify_telegram_id:
+            job.notify_telegram_id = notify_telegram_id
+
+        send = False
+        if job.status == "queued":
+            if priority < job.priority:
+                # The stale lower-priority message is skipped by the worker's claim
+                job.priority = priority
+                send = True
+        elif job.status == "processing" and not self._is_stale(job):
+            job.rerun = True
+        else:
+            # New, finished, or processing past the task time limit (its run is lost)
+            job.status = "queued"
+            job.priority = priority
+            job.attempts = 0
+            job.error = None
+            job.queued_at = datetime.utcnow()
+            send = True
+
+        if send:
+            job.task_token = uuid4().hex
+        await self.db.commit()
+        if send:
+            self.send(document_id, job.priority, job.task_token)
+        else:
+            logger.info(f"Document {document_id} already {job.status}, not queued again")
+        return job
+
+    @staticmethod
+    def _is_stale(job: IndexingJob) -> bool:
+        """Whether a processing job has outlived the task time limit."""
+        stale_before = datetime.utcnow() - timedelta(seconds=celery_app.conf.task_time_limit)
+        return job.started_at is None or job.started_at < stale_before
+
+    @staticmethod
+    def send(document_id: int, priority: int, task_token: str, countdown: Optional[int] = None) -> None:
+        """Publish the indexing task (by name, so the API needn't import worker code)."""
+        celery_app.send_task(
+            INDEX_TASK_NAME,
+            args=[document_id, task_token],
+            queue=INDEXING_QUEUE,
+            priority=priority,
+            countdown=countdown
+        )
+
+    async def claim(self, document_id: int, task_token: Optional[str] = None) -> Optional[IndexingJob]:
+        """
+        Mark a queued job as processing.
+
+        A job already processing under the same token is taken over: its
+        message was redelivered because the worker running it died.
+
+        Args:
+            document_id: Document ID
+            task_token: Token of the task message (None for messages sent
+                before tokens existed)
+
+        Returns:
+            The job, or None if the message is superseded and must be skipped
+        """
+        if task_token is None:
+            stale_before = datetime.utcnow() - timedelta(seconds=celery_app.conf.task_time_limit)
+            claimable = or_(
+                IndexingJob.status == "queued",
+                (IndexingJob.status == "processing") & (IndexingJob.started_at < stale_before)
+            )
+        else:
+            claimable = (IndexingJob.task_token == task_token) & IndexingJob.status.in_(["queued", "processing"])
+
+        result = await self.db.execute(
+            update(IndexingJob)
+            .where(IndexingJob.document_id == document_id, claimable)
+            .values(
+                status="processing",
+                attempts=IndexingJob.attempts + 1,
+                rerun=False,
+                started_at=datetime.utcnow()
+            )
+            .returning(IndexingJob.id)
+        )
+        job_id = result.scalar()
+        await self.db.commit()
+        if job_id is None:
+            return None
+        return await self.db.get(IndexingJob, job_id)
+
+    async def complete(self, job: IndexingJob, success: bool, error: Optional[str] = None) -> bool:
+        """
+        Record the outcome of a run and requeue it if needed.
+
+        Returns:
+            True if the job reached a final state (done or failed)
+        """
+        await self.db.refresh(job)
+        job.finished_at = datetime.utcnow()
+
+        if job.rerun:
+            # Re-requested while running: index again with the latest file
+            job.status = "queued"
+            job.rerun = False
+            job.attempts = 0
+            job.task_token = uuid4().hex
+            await self.db.commit()
+            self.send(job.document_id, job.priority, job.task_token)
+            return False
+
+        if success:
+            job.status = "done"
+            job.error = None
+            await self.db.commit()
+            return True
+
+        job.error = error
+        if job.attempts <= settings.indexing_max_retries:
+            job.status = "queued"
+            job.task_token = uuid4().hex
+            await self.db.commit()
+            countdown = settings.indexing_retry_backoff * 2 ** (job.attempts - 1)
+            self.send(job.document_id, job.priority, job.task_token, countdown=countdown)
+            logger.warning(f"Indexing document {job.document_id} failed, retry {job.attempts} in {countdown}s")
+            return False
+
+        job.status = "failed"
+        await self.db.commit()
+        logger.error(f"Indexing document {job.document_id} failed after {job.attempts} attempts: {error}")
+        return True
+
+    async def get_status(self, document_id: int) -> Optional[IndexingJob]:
+        """Get the indexing job of a document."""
+        return await self.db.scalar(select(IndexingJob).where(IndexingJob.document_id == document_id))
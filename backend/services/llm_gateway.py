@@ -0,0 +1,468 @@
+"""
+LLM gateway: the one place that creates LLM clients.
+
+Per-role models (model tiering) on a pooled HTTP client, with per-call
+timeouts, retries with jitter, a circuit breaker, a concurrency cap and
+latency/token/cost metrics.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from config import settings
+from services.context_builder import get_encoding
+
+logger = logging.getLogger(__name__)
+
+# Roles and their default tier: short utility calls run on the fast model
+ROLES = {
+    "router": "fast",  # intent classification (+ slot extraction)
+    "extractor": "fast",  # slot extraction, query rewriting
+    "generator": "main",  # answers shown to the user
+    "digest": "main",  # daily digest
+}
+ROLE_TEMPERATURES = {"router": 0.0, "extractor": 0.0, "generator": 0.7, "digest": 0.7}
+
+# USD per 1M prompt/completion tokens; unknown models are reported without cost
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4-turbo-preview": (10.00, 30.00),
+    "gpt-4": (30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+}
+
+# Cap of the exponential retry backoff, seconds
+MAX_BACKOFF = 8.0
+
+# Queue that receives answer tokens while a message is processed in streaming
+# mode (see agents.workflow.stream_message); nodes run in tasks that inherit it
+token_sink: ContextVar[Optional[asyncio.Queue]] = ContextVar("llm_token_sink", default=None)
+
+
+class LLMUnavailableError(RuntimeError):
+    """The circuit breaker of a model is open."""
+
+
+def get_role_model(role: str) -> str:
+    """
+    Model name configured for a role.
+
+    Args:
+        role: router, extractor, generator or digest
+
+    Returns:
+        ``llm_<role>_model`` if set, otherwise the fast or main model of the backend
+    """
+    override = getattr(settings, f"llm_{role}_model")
+    if override:
+        return override
+    if settings.use_ollama:
+        return (ROLES[role] == "fast" and settings.ollama_fast_model) or settings.ollama_model
+    return settings.openai_fast_model if ROLES[role] == "fast" else settings.openai_model
+
+
+def get_role_timeout(role: str) -> float:
+    """Per-call timeout of a role, seconds."""
+    return settings.llm_fast_timeout if ROLES[role] == "fast" else settings.llm_timeout
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` transient failures in a row, calls fail fast
+    for ``reset_timeout`` seconds. Then trial calls go through again; the
+    first success closes the circuit, a failure opens it for another period.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        """Initialize breaker."""
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "open" if time.monotonic() - self.opened_at < self.reset_timeout else "half-open"
+
+    def check(self) -> None:
+        """Raise LLMUnavailableError while the circuit is open."""
+        if self.state == "open":
+            raise LLMUnavailableError(f"LLM {self.name} is unavailable, retrying after {self.reset_timeout}s")
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info(f"Circuit of LLM {self.name} closed")
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.error(f"Circuit of LLM {self.name} opened after {self.failures} failures")
+            self.opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(model: str) -> CircuitBreaker:
+    """Process-wide circuit breaker of a model."""
+    breaker = _breakers.get(model)
+    if breaker is None:
+        breaker = CircuitBreaker(model, settings.llm_circuit_failures, settings.llm_circuit_reset)
+        _breakers[model] = breaker
+    return breaker
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether an error is worth retrying (timeouts, connection errors, rate limits, 5xx)."""
+    import openai
+
+    return isinstance(error, (
+        asyncio.TimeoutError,
+        ConnectionError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.RateLimitError,
+        openai.InternalServerError,
+    ))
+
+
+class LLMMetrics:
+    """Per-role call counts, latency, token usage and estimated cost of this process."""
+
+    def __init__(self):
+        """Initialize empty counters."""
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+
+    def record(
+        self,
+        role: str,
+        model: str,
+        latency: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        error: bool = False,
+        estimated: bool = False
+    ) -> None:
+        """Count one model call; ``estimated`` marks token counts computed locally."""
+        prices = MODEL_PRICES.get(model)
+        with self._lock:
+            stats = self._stats[role]
+            stats["calls"] += 1
+            stats["errors"] += error
+            stats["usage_estimated"] += estimated
+            stats["latency_total"] += latency
+            stats["latency_max"] = max(stats["latency_max"], latency)
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            if prices:
+                stats["cost_usd"] += (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+    def record_event(self, role: str, event: str) -> None:
+        """Count a gateway event (retried, rejected)."""
+        with self._lock:
+            self._stats[role][event] += 1
+
+    def snapshot(self) -> dict:
+        """Totals, average latency and circuit state per role."""
+        with self._lock:
+            roles = {}
+            for role, stats in self._stats.items():
+                model = get_role_model(role)
+                calls = stats["calls"]
+                roles[role] = {
+                    "model": model,
+                    "calls": int(calls),
+                    "errors": int(stats["errors"]),
+                    "retried": int(stats["retried"]),
+                    "rejected": int(stats["rejected"]),
+                    "latency_avg": round(stats["latency_total"] / calls, 3) if calls else 0.0,
+                    "latency_max": round(stats["latency_max"], 3),
+                    "prompt_tokens": int(stats["prompt_tokens"]),
+                    "completion_tokens": int(stats["completion_tokens"]),
+                    "usage_estimated": int(stats["usage_estimated"]),
+                    "cost_usd": round(stats["cost_usd"], 6),
+                    "circuit": get_breaker(model).state,
+                }
+            return roles
+
+
+llm_metrics = LLMMetrics()
+
+
+class RoleMetricsHandler(BaseCallbackHandler):
+    """
+    Callback that times each model call of a role and records its token usage.
+
+    Streamed responses carry no usage from the API, so their tokens are
+    counted with tiktoken from the prompt and the streamed text (reported
+    as ``usage_estimated``).
+    """
+
+    run_inline = True
+
+    def __init__(self, role: str, model: str):
+        """Initialize handler."""
+        self.role = role
+        self.model = model
+        self._started: Dict[UUID, float] = {}
+        self._prompts: Dict[UUID, List[str]] = {}
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+        self._prompts[run_id] = list(prompts)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started[run_id] = time.perf_counter()
+        self._prompts[run_id] = [str(message.content) for batch in messages for message in batch]
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompts = self._prompts.pop(run_id, [])
+        if usage:
+            prompt_tokens = usage.get("prompt_tokens", 0)
+            completion_tokens = usage.get("completion_tokens", 0)
+        else:
+            prompt_tokens = self._count(prompts)
+            completion_tokens = self._count(g.text for gs in response.generations for g in gs)
+        llm_metrics.record(
+            self.role,
+            self.model,
+            self._elapsed(run_id),
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            estimated=not usage
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._prompts.pop(run_id, None)
+        llm_metrics.record(self.role, self.model, self._elapsed(run_id), error=True)
+
+    def _elapsed(self, run_id: UUID) -> float:
+        started = self._started.pop(run_id, None)
+        return time.perf_counter() - started if started else 0.0
+
+    def _count(self, texts) -> int:
+        encoding = get_encoding(self.model)
+        return sum(len(encoding.encode(text)) for text in texts if text)
+
+
+class _LoopClients:
+    """Clients of one event loop: the pooled OpenAI client, role models and the concurrency cap."""
+
+    def __init__(self):
+        self.semaphore = asyncio.Semaphore(settings.llm_max_concurrency)
+        self.models: Dict[str, Any] = {}
+        self._openai = None
+
+    def openai(self):
+        """AsyncOpenAI client whose connection pool is shared by all roles."""
+        if self._openai is None:
+            import httpx
+            import openai
+
+            self._openai = openai.AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                timeout=httpx.Timeout(settings.llm_timeout, connect=10.0),
+                max_retries=0,  # retried by the gateway
+                http_client=httpx.AsyncClient(limits=httpx.Limits(
+                    max_connections=settings.llm_max_connections,
+                    max_keepalive_connections=settings.llm_max_connections
+                ))
+            )
+        return self._openai
+
+    def model(self, role: str):
+        client = self.models.get(role)
+        if client is None:
+            model = get_role_model(role)
+            callbacks = [RoleMetricsHandler(role, model)]
+            if settings.use_ollama:
+                from langchain_community.llms import Ollama
+                client = Ollama(
+                    base_url=settings.ollama_base_url,
+                    model=model,
+                    temperature=ROLE_TEMPERATURES[role],
+                    timeout=int(get_role_timeout(role)),
+                    callbacks=callbacks,
+                )
+            else:
+                from langchain_openai import ChatOpenAI
+                client = ChatOpenAI(
+                    model=model,
+                    temperature=ROLE_TEMPERATURES[role],
+                    api_key=settings.openai_api_key,
+                    async_client=self.openai().chat.completions,
+                    callbacks=callbacks,
+                )
+            self.models[role] = client
+        return client
+
+
+# Async clients and semaphores are bound to the event loop that created them
+# (Celery tasks run each job in a fresh asyncio.run loop)
+_loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopClients]" = weakref.WeakKeyDictionary()
+
+
+def _get_loop_clients() -> _LoopClients:
+    loop = asyncio.get_running_loop()
+    clients = _loop_clients.get(loop)
+    if clients is None:
+        clients = _LoopClients()
+        _loop_clients[loop] = clients
+    return clients
+
+
+class GatewayLLM:
+    """
+    LLM of a role, called through the gateway.
+
+    Supports the subset of the LangChain model interface the agents use:
+    ``ainvoke`` and ``bind``; ``ainvoke(..., stream_tokens=True)`` streams
+    the answer when the caller is streaming.
+    """
+
+    def __init__(self, role: str, bind_kwargs: Optional[Dict[str, Any]] = None):
+        """Initialize role model."""
+        if role not in ROLES:
+            raise ValueError(f"Unknown LLM role: {role}")
+        self.role = role
+        self.bind_kwargs = bind_kwargs or {}
+
+    @property
+    def model_name(self) -> str:
+        return get_role_model(self.role)
+
+    @property
+    def supports_tools(self) -> bool:
+        """Whether the model accepts OpenAI function calling (Ollama completion models don't)."""
+        return not settings.use_ollama
+
+    def bind(self, **kwargs: Any) -> "GatewayLLM":
+        """Same role with extra call arguments (e.g. tools)."""
+        return GatewayLLM(self.role, {**self.bind_kwargs, **kwargs})
+
+    async def ainvoke(self, messages: List, stream_tokens: bool = False) -> Any:
+        """
+        Call the model.
+
+        Transient failures are retried with exponential backoff and full
+        jitter; each attempt is bounded by the role's timeout and waits for
+        a slot under the concurrency cap.
+
+        Args:
+            messages: Prompt messages
+            stream_tokens: Stream the answer to the active token sink, if any
+                (only for text shown to the user as is)
+
+        Returns:
+            Model response (AIMessage, or str for Ollama)
+
+        Raises:
+            LLMUnavailableError: The model's circuit breaker is open
+        """
+        sink = token_sink.get() if stream_tokens else None
+        if sink is None:
+            return await self._call(
+                lambda model, timeout, delivered: asyncio.wait_for(model.ainvoke(messages), timeout)
+            )
+        return await self._call(
+            lambda model, timeout, delivered: self._stream(model, messages, timeout, sink, delivered)
+        )
+
+    async def _stream(self, model, messages: List, timeout: float, sink: asyncio.Queue, delivered: List[str]) -> Any:
+        # The timeout bounds the wait for each chunk, not the whole answer
+        chunks = model.astream(messages).__aiter__()
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout)
+                except StopAsyncIteration:
+                    break
+                text = chunk.content if hasattr(chunk, "content") else chunk
+                if text:
+                    delivered.append(text)
+                    sink.put_nowait(text)
+        finally:
+            await chunks.aclose()
+        content = "".join(delivered)
+        if settings.use_ollama:
+            return content
+        from langchain_core.messages import AIMessage
+        return AIMessage(content=content)
+
+    async def _call(self, call: Callable[[Any, float, List[str]], Awaitable[Any]]) -> Any:
+        clients = _get_loop_clients()
+        model = clients.model(self.role)
+        if self.bind_kwargs:
+            model = model.bind(**self.bind_kwargs)
+        breaker = get_breaker(self.model_name)
+        timeout = get_role_timeout(self.role)
+
+        for attempt in range(settings.llm_max_retries + 1):
+            try:
+                breaker.check()
+            except LLMUnavailableError:
+                llm_metrics.record_event(self.role, "rejected")
+                raise
+            # Streamed tokens already reached the user, so such calls can't be retried
+            delivered: List[str] = []
+            try:
+                async with clients.semaphore:
+                    response = await call(model, timeout, delivered)
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                breaker.record_failure()
+                if attempt == settings.llm_max_retries or delivered:
+                    raise
+                delay = random.uniform(0, min(MAX_BACKOFF, settings.llm_retry_backoff * 2 ** attempt))
+                llm_metrics.record_event(self.role, "retried")
+                logger.warning(
+                    f"LLM {self.role} ({self.model_name}) call failed: {e!r}, "
+                    f"retry {attempt + 1} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+            else:
+                breaker.record_success()
+                return response
+
+
+_role_llms: Dict[str, GatewayLLM] = {}
+
+
+def get_llm(role: str = "generator") -> GatewayLLM:
+    """
+    Get the LLM of a role.
+
+    Args:
+        role: router, extractor, generator or digest
+
+    Returns:
+        Gateway model of the role
+    """
+    llm = _role_llms.get(role)
+    if llm is None:
+        llm = GatewayLLM(role)
+        _role_llms[role] = llm
+    return llm
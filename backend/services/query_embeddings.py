@@ -0,0 +1,181 @@
+"""Query embedding with an in-process LRU+TTL cache and request coalescing."""
+import asyncio
+import logging
+import time
+import unicodedata
+import weakref
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a query: NFKC, case-folded, collapsed whitespace."""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+class QueryEmbeddingCache:
+    """LRU cache of query vectors with per-entry expiry. Not loop-bound, shared process-wide."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        """Initialize empty cache."""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, List[float]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[List[float]]:
+        """Get a fresh vector and mark it as recently used."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Tuple[str, str], vector: List[float]) -> None:
+        """Store a vector, evicting the least recently used entries over capacity."""
+        self._entries[key] = (time.monotonic() + self.ttl, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class _QueryBatcher:
+    """
+    Coalesces concurrent query embeddings into one request.
+
+    Identical queries in flight share a future; distinct queries arriving
+    within the batch window are sent together as one call: ``aembed_queries``
+    for backends that embed queries differently from documents (e.g. e5
+    prefixes), else ``aembed_documents``. Bound to the event loop it was
+    created in.
+    """
+
+    def __init__(self, embeddings: Embeddings, window: float, max_batch: int):
+        self.embeddings = embeddings
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        # The event loop only keeps weak references to tasks
+        self._running: Set[asyncio.Task] = set()
+
+    def submit(self, text: str) -> asyncio.Future:
+        future = self._pending.get(text)
+        if future is not None:
+            return future
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[text] = future
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        return future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.window)
+        self._flush_task = None
+        self._flush()
+
+    def _flush(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: Dict[str, asyncio.Future]):
+        texts = list(batch.keys())
+        try:
+            embed = getattr(self.embeddings, "aembed_queries", None) or self.embeddings.aembed_documents
+            vectors = await embed(texts)
+            if len(texts) > 1:
+                logger.debug(f"Coalesced {len(texts)} query embeddings into one request")
+            for text, vector in zip(texts, vectors):
+                if not batch[text].done():
+                    batch[text].set_result(vector)
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+
+
+_cache: Optional[QueryEmbeddingCache] = None
+_batchers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[int, _QueryBatcher]]" = weakref.WeakKeyDictionary()
+
+
+def get_query_cache() -> QueryEmbeddingCache:
+    """Get the process-wide query embedding cache."""
+    global _cache
+    if _cache is None:
+        _cache = QueryEmbeddingCache(
+            settings.query_embedding_cache_size,
+            settings.query_embedding_cache_ttl
+        )
+    return _cache
+
+
+def _get_batcher(embeddings: Embeddings) -> _QueryBatcher:
+    batchers = _batchers.setdefault(asyncio.get_running_loop(), {})
+    batcher = batchers.get(id(embeddings))
+    if batcher is None:
+        batcher = _QueryBatcher(
+            embeddings,
+            window=settings.query_embedding_batch_window_ms / 1000,
+            max_batch=settings.query_embedding_max_batch
+        )
+        batchers[id(embeddings)] = batcher
+    return batcher
+
+
+async def embed_query(embeddings: Embeddings, query: str, model_key: str) -> List[float]:
+    """
+    Embed a search query, served from cache when possible.
+
+    Args:
+        embeddings: Embedding backend
+        query: Raw query text (normalized before embedding and caching)
+        model_key: Identity of the produced vectors, part of the cache key
+
+    Returns:
+        Query vector
+    """
+    text = normalize_query(query)
+    key = (model_key, text)
+    cache = get_query_cache()
+
+    vector = cache.get(key)
+    if vector is not None:
+        return vector
+
+    # Shielded so one cancelled caller doesn't fail others sharing the request
+    vector = await asyncio.shield(_get_batcher(embeddings).submit(text))
+    cache.put(key, vector)
+    return vector
+
+
+async def embed_queries(embeddings: Embeddings, queries: List[str], model_key: str) -> List[List[float]]:
+    """
+    Embed several search queries at once.
+
+    Cache misses are submitted to the batcher in the same tick, so they go
+    out as one embeddings request (split only beyond the batch size cap).
+
+    Returns:
+        Vectors in the same order as ``queries``
+    """
+    return list(await asyncio.gather(*(embed_query(embeddings, query, model_key) for query in queries)))
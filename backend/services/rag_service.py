@@ -1,21 +1,594 @@
 """RAG (Retrieval Augmented Generation) service for document indexing and retrieval."""
+import asyncio
 import logging
-import os
+import re
+import time
 import uuid
-from typing import List, Optional
-import PyPDF2
-import docx
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.models import (
+    Distance,
+    VectorParams,
+    PointStruct,
+    PointsList,
+    PointIdsList,
+    FilterSelector,
+    Filter,
+    FieldCondition,
+    MatchValue,
+    SetPayload,
+    UpsertOperation,
+    SetPayloadOperation,
+    HnswConfigDiff,
+    PayloadSchemaType,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    QuantizationSearchParams,
+    SearchParams,
+    SearchRequest,
+    CollectionParamsDiff,
+    VectorParamsDiff,
+    OptimizersConfigDiff,
+    CreateAlias,
+    CreateAliasOperation,
+    Disabled,
+)
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
 
-from db.models import Document
+from db.models import Document, VectorCollection
 from config import settings
+from services.embedding_cache import EmbeddingCache, text_hash
+from services.chunk_store import ChunkStore
+from services.text_extraction import iter_text_segments
+from services.chunker import TextChunk, TokenChunker
+from services.embedding_dispatcher import MAX_REQUEST_INPUTS, embed_documents
+from services.query_embeddings import embed_query, embed_queries
+from services.answer_cache import invalidate_user_answers
 
 logger = logging.getLogger(__name__)
 
+# Collection created on first start; re-embedding builds versioned collections next to it
+COLLECTION_NAME = "documents"
+# Alias pointing at the collection that is currently served (see get_active_collection)
+COLLECTION_ALIAS = "documents_active"
+
+# Payload indexes: every search filters on user_id (tenant), deletes/diffs on document_id
+PAYLOAD_INDEXES = {
+    "user_id": PayloadSchemaType.INTEGER,
+    "document_id": PayloadSchemaType.INTEGER,
+    "file_type": PayloadSchemaType.KEYWORD,
+}
+# Per-tenant HNSW graphs (built per user_id value) instead of one global graph
+MULTITENANT_HNSW_CONFIG = HnswConfigDiff(payload_m=16, m=0)
+
+# Native output sizes of the OpenAI embedding models
+OPENAI_EMBEDDING_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+# Process-wide clients, created lazily on first use and shared by every RAGService
+_qdrant_client: Optional[QdrantClient] = None
+_embeddings: Dict["EmbeddingSpec", Embeddings] = {}
+_query_embeddings: Dict["EmbeddingSpec", Embeddings] = {}
+# Async clients hold connection pools bound to the event loop that created them.
+# Celery tasks run each job in a fresh asyncio.run() loop, so keep one per loop.
+_async_qdrant_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncQdrantClient]" = weakref.WeakKeyDictionary()
+_collection_ready = False
+# Seconds between retries of ensure_collection while Qdrant is unreachable
+COLLECTION_RETRY_INTERVAL = 5.0
+_collection_retry_at = 0.0
+# Resolved alias target, cached until the expiry time
+_active_collection: Optional[Tuple[float, "ActiveCollection"]] = None
+
+
+class EmbeddingSpec(NamedTuple):
+    """Which embeddings a collection holds."""
+    backend: str  # openai or local
+    model: str
+    dimensions: Optional[int] = None  # Shortened output size (text-embedding-3 only)
+
+
+class ActiveCollection(NamedTuple):
+    """The collection searches and writes go to, with the embeddings it was built with."""
+    name: str
+    spec: EmbeddingSpec
+
+
+def default_embedding_spec() -> EmbeddingSpec:
+    """Embeddings configured in settings, used for collections without a registry entry."""
+    if settings.embedding_backend == "local":
+        return EmbeddingSpec("local", settings.local_embedding_model)
+    return EmbeddingSpec("openai", settings.openai_embedding_model, settings.embedding_dimensions)
+
+
+def get_qdrant_client() -> QdrantClient:
+    """Get the shared synchronous Qdrant client."""
+    global _qdrant_client
+    if _qdrant_client is None:
+        _qdrant_client = QdrantClient(
+            url=settings.qdrant_url,
+            api_key=settings.qdrant_api_key,
+            timeout=30
+        )
+    return _qdrant_client
+
+
+def get_async_qdrant_client() -> AsyncQdrantClient:
+    """Get the async Qdrant client shared within the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_qdrant_clients.get(loop)
+    if client is None:
+        client = AsyncQdrantClient(
+            url=settings.qdrant_url,
+            api_key=settings.qdrant_api_key,
+            timeout=30
+        )
+        _async_qdrant_clients[loop] = client
+    return client
+
+
+class _TokenizerEncoding:
+    """Hugging Face tokenizer behind the encode/decode interface the chunker expects."""
+    
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+    
+    def encode(self, text: str) -> List[int]:
+        return self.tokenizer.encode(text, add_special_tokens=False)
+    
+    def decode(self, tokens: List[int]) -> str:
+        return self.tokenizer.decode(tokens)
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    CPU embedding backend using a sentence-transformers model.
+    
+    The model is loaded once per process. Inputs are split into batches that
+    are encoded in parallel on a thread pool (torch releases the GIL during
+    inference), so throughput scales with local cores instead of API limits.
+    
+    The model silently truncates inputs past its ``max_seq_length``, so
+    ``encoding`` and ``max_tokens`` are exposed for the chunker to measure
+    and cap chunks in the model's own tokens.
+    """
+    
+    def __init__(self, model_name: str, batch_size: int = 32, threads: int = 4):
+        """Load the model (requires the optional sentence-transformers package)."""
+        from sentence_transformers import SentenceTransformer
+        
+        self.model = model_name
+        self.batch_size = batch_size
+        self._encoder = SentenceTransformer(model_name, device="cpu")
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="embed")
+        self.dimensions = self._encoder.get_sentence_embedding_dimension()
+        # e5 models are trained with these prefixes
+        is_e5 = "e5" in model_name.lower()
+        self._query_prefix = "query: " if is_e5 else ""
+        self._passage_prefix = "passage: " if is_e5 else ""
+        self.encoding = _TokenizerEncoding(self._encoder.tokenizer)
+        # Room for the special tokens and the passage prefix
+        self.max_tokens = self._encoder.max_seq_length - 2 - len(self.encoding.encode(self._passage_prefix))
+    
+    def _encode(self, texts: List[str], prefix: str = "") -> List[List[float]]:
+        return self._encoder.encode(
+            [prefix + text for text in texts] if prefix else texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        ).tolist()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, encoding batches in parallel."""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        vectors = []
+        for batch_vectors in self._executor.map(lambda batch: self._encode(batch, self._passage_prefix), batches):
+            vectors.extend(batch_vectors)
+        return vectors
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query."""
+        return self._encode([text], self._query_prefix)[0]
+    
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries in one pass (query-side prefix, unlike embed_documents)."""
+        return self._encode(texts, self._query_prefix)
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents without blocking the event loop."""
+        return await asyncio.to_thread(self.embed_documents, texts)
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed a query without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.embed_query, text)
+    
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.embed_queries, texts)
+
+
+def get_embeddings(spec: Optional[EmbeddingSpec] = None) -> Optional[Embeddings]:
+    """
+    Get the shared embedding backend for a spec (default: from settings).
+    
+    Returns None if the OpenAI backend is selected but no API key is configured.
+    """
+    spec = spec or default_embedding_spec()
+    embeddings = _embeddings.get(spec)
+    if embeddings is None:
+        if spec.backend == "local":
+            embeddings = LocalEmbeddings(
+                spec.model,
+                batch_size=settings.local_embedding_batch_size,
+                threads=settings.local_embedding_threads
+            )
+        elif settings.openai_api_key:
+            embeddings = OpenAIEmbeddings(
+                openai_api_key=settings.openai_api_key,
+                model=spec.model,
+                # text-embedding-3 models can return shortened vectors natively
+                dimensions=spec.dimensions,
+                chunk_size=MAX_REQUEST_INPUTS,  # Never re-split a dispatcher batch
+                max_retries=0  # The dispatcher retries with its own backoff and rate limits
+            )
+        else:
+            return None
+        _embeddings[spec] = embeddings
+    return embeddings
+
+
+def get_query_embeddings(spec: Optional[EmbeddingSpec] = None) -> Optional[Embeddings]:
+    """
+    Get the embedding backend for search queries.
+    
+    Queries bypass the embedding dispatcher, so the OpenAI client for them
+    keeps the SDK's own retries on 429s and connection errors (the indexing
+    client has them disabled). Local backends are shared.
+    """
+    spec = spec or default_embedding_spec()
+    if spec.backend == "local" or not settings.openai_api_key:
+        return get_embeddings(spec)
+    embeddings = _query_embeddings.get(spec)
+    if embeddings is None:
+        embeddings = OpenAIEmbeddings(
+            openai_api_key=settings.openai_api_key,
+            model=spec.model,
+            dimensions=spec.dimensions
+        )
+        _query_embeddings[spec] = embeddings
+    return embeddings
+
+
+def get_embedding_model_key(spec: Optional[EmbeddingSpec] = None) -> str:
+    """Identity of the vectors produced (model plus output size), used as the cache key."""
+    spec = spec or default_embedding_spec()
+    if spec.backend != "local" and spec.dimensions:
+        return f"{spec.model}:{spec.dimensions}"
+    return spec.model
+
+
+def get_embedding_dimensions(spec: Optional[EmbeddingSpec] = None) -> int:
+    """Vector size for a spec: the local model's size, else the requested/native OpenAI size."""
+    spec = spec or default_embedding_spec()
+    if spec.backend == "local":
+        return get_embeddings(spec).dimensions
+    if spec.dimensions:
+        return spec.dimensions
+    return OPENAI_EMBEDDING_DIMENSIONS.get(spec.model, 1536)
+
+
+async def get_active_collection(db: AsyncSession) -> ActiveCollection:
+    """
+    Resolve the served collection and its embeddings.
+    
+    The alias target is looked up in Qdrant and its embedding spec in the
+    ``vector_collections`` registry (collections missing there use the
+    settings). The pair is cached for ``settings.qdrant_alias_cache_ttl``
+    seconds, so query vectors always match the collection they search even
+    while an alias swap propagates.
+    """
+    global _active_collection
+    now = time.monotonic()
+    if _active_collection and _active_collection[0] > now:
+        return _active_collection[1]
+    
+    name = COLLECTION_NAME
+    try:
+        response = await get_async_qdrant_client().get_aliases()
+        for alias in response.aliases:
+            if alias.alias_name == COLLECTION_ALIAS:
+                name = alias.collection_name
+                break
+    except Exception as e:
+        logger.warning(f"Could not resolve collection alias: {e}")
+        if _active_collection:
+            return _active_collection[1]
+    
+    record = await db.scalar(select(VectorCollection).where(VectorCollection.name == name))
+    spec = (
+        EmbeddingSpec(record.embedding_backend, record.embedding_model, record.dimensions)
+        if record else default_embedding_spec()
+    )
+    active = ActiveCollection(name, spec)
+    _active_collection = (now + settings.qdrant_alias_cache_ttl, active)
+    return active
+
+
+def reset_active_collection() -> None:
+    """Forget the cached alias target of this process."""
+    global _active_collection
+    _active_collection = None
+
+
+def get_quantization_config():
+    """Quantization selected by ``settings.qdrant_quantization`` (none/scalar/binary)."""
+    mode = settings.qdrant_quantization
+    if mode == "scalar":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(
+            type=ScalarType.INT8,
+            quantile=0.99,
+            always_ram=True
+        ))
+    if mode == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def get_quantization_config_diff():
+    """Quantization for update_collection, where None would mean "unchanged" rather than "none"."""
+    return get_quantization_config() or Disabled.DISABLED
+
+
+def get_search_params() -> Optional[SearchParams]:
+    """
+    Search parameters for the configured storage mode.
+    
+    With quantization, candidates are found on the in-RAM quantized vectors
+    (oversampled) and rescored against the original vectors, which may live
+    on disk.
+    """
+    if settings.qdrant_quantization not in ("scalar", "binary"):
+        return None
+    return SearchParams(quantization=QuantizationSearchParams(
+        ignore=False,
+        rescore=True,
+        oversampling=settings.qdrant_quantization_oversampling
+    ))
+
+
+def _ensure_payload_indexes(client: QdrantClient, collection_name: str, existing_schema: dict) -> None:
+    """Create any missing payload indexes (idempotent, also migrates older collections)."""
+    for field_name, field_schema in PAYLOAD_INDEXES.items():
+        if field_name in existing_schema:
+            continue
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=field_schema,
+            wait=False
+        )
+        logger.info(f"Created payload index on {collection_name}.{field_name}")
+
+
+def create_collection(
+    client: QdrantClient,
+    collection_name: str,
+    dimensions: int,
+    indexing_threshold: Optional[int] = None
+) -> None:
+    """
+    Create a collection with the multitenant layout, storage settings and payload indexes.
+    
+    Args:
+        client: Qdrant client
+        collection_name: Name of the new collection
+        dimensions: Vector size
+        indexing_threshold: Optimizer indexing threshold; 0 defers HNSW
+            building during bulk loads (default: Qdrant's)
+    """
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=VectorParams(
+            size=dimensions,
+            distance=Distance.COSINE,
+            on_disk=settings.qdrant_vectors_on_disk
+        ),
+        hnsw_config=MULTITENANT_HNSW_CONFIG,
+        quantization_config=get_quantization_config(),
+        on_disk_payload=settings.qdrant_payload_on_disk,
+        optimizers_config=OptimizersConfigDiff(indexing_threshold=indexing_threshold)
+        if indexing_threshold is not None else None
+    )
+    _ensure_payload_indexes(client, collection_name, {})
+    logger.info(f"Created Qdrant collection: {collection_name} ({dimensions} dims)")
+
+
+def _get_alias_target(client: QdrantClient) -> Optional[str]:
+    for alias in client.get_aliases().aliases:
+        if alias.alias_name == COLLECTION_ALIAS:
+            return alias.collection_name
+    return None
+
+
+def ensure_collection() -> bool:
+    """
+    Ensure the served collection exists with its payload indexes and alias.
+    
+    New collections use the multitenant layout: HNSW graphs are built per
+    ``user_id`` (payload_m) instead of globally (m=0), since every search is
+    filtered by user. Existing collections get missing payload indexes
+    added here; switching their HNSW layout is done by ``migrate_collection_layout``.
+    Without an alias yet, ``COLLECTION_ALIAS`` is pointed at ``COLLECTION_NAME``.
+    
+    Called at startup (API lifespan, Celery worker init) and retried from
+    ``RAGService`` until it succeeds, since Qdrant may come up after this
+    process; once ready, calls are no-ops.
+    
+    Returns:
+        True if the collection is ready
+    """
+    global _collection_ready
+    if _collection_ready:
+        return True
+    
+    try:
+        client = get_qdrant_client()
+        target = _get_alias_target(client)
+        
+        if target:
+            existing_schema = client.get_collection(target).payload_schema or {}
+            _ensure_payload_indexes(client, target, existing_schema)
+        else:
+            collections = client.get_collections()
+            collection_names = [c.name for c in collections.collections]
+            if COLLECTION_NAME not in collection_names:
+                create_collection(client, COLLECTION_NAME, get_embedding_dimensions())
+            else:
+                existing_schema = client.get_collection(COLLECTION_NAME).payload_schema or {}
+                _ensure_payload_indexes(client, COLLECTION_NAME, existing_schema)
+            client.update_collection_aliases(change_aliases_operations=[
+                CreateAliasOperation(create_alias=CreateAlias(
+                    collection_name=COLLECTION_NAME,
+                    alias_name=COLLECTION_ALIAS
+                ))
+            ])
+            logger.info(f"Created alias {COLLECTION_ALIAS} -> {COLLECTION_NAME}")
+        
+        _collection_ready = True
+    except Exception as e:
+        logger.warning(f"Could not ensure collection: {e}")
+    
+    return _collection_ready
+
+
+def migrate_collection_layout() -> None:
+    """
+    Move an existing collection to the multitenant layout and configured storage.
+    
+    Adds missing payload indexes, switches HNSW to per-tenant graphs and
+    applies the quantization / on-disk settings. Qdrant rebuilds in the
+    background; search keeps working meanwhile (falling back to filtered
+    full scan for unindexed segments). The vector size can't be changed
+    in place - that needs re-embedding into a new collection.
+    """
+    client = get_qdrant_client()
+    collection_name = _get_alias_target(client) or COLLECTION_NAME
+    existing_schema = client.get_collection(collection_name).payload_schema or {}
+    _ensure_payload_indexes(client, collection_name, existing_schema)
+    apply_storage_settings(client, collection_name)
+    logger.info(
+        f"Switched {collection_name} to multitenant HNSW layout "
+        f"(quantization={settings.qdrant_quantization}, vectors_on_disk={settings.qdrant_vectors_on_disk})"
+    )
+
+
+def apply_storage_settings(client: QdrantClient, collection_name: str) -> None:
+    """Switch an existing collection to the multitenant layout and the configured storage mode."""
+    client.update_collection(
+        collection_name=collection_name,
+        hnsw_config=MULTITENANT_HNSW_CONFIG,
+        vectors_config={"": VectorParamsDiff(on_disk=settings.qdrant_vectors_on_disk)},
+        # Explicitly disabled, so a quantized collection can be switched back to none
+        quantization_config=get_quantization_config_diff(),
+        collection_params=CollectionParamsDiff(on_disk_payload=settings.qdrant_payload_on_disk)
+    )
+
+
+# Digits, quotes or uppercase codes (e.g. "INV-2024", «Ромашка», НДС)
+IDENTIFIER_PATTERN = re.compile(r'\d|["«»“”]|\b[A-ZА-ЯЁ][A-ZА-ЯЁ0-9_-]+\b')
+
+
+def is_identifier_query(query: str) -> bool:
+    """
+    Short queries for an exact identifier, which lexical search can answer on its own.
+
+    Plain words aren't enough: a match on every term of "отпуск летом" says
+    nothing about relevance, while a hit on a policy number or a quoted name does.
+    """
+    terms = re.findall(r"\w+", query)
+    return 0 < len(terms) <= settings.rag_lexical_fast_path_terms and bool(IDENTIFIER_PATTERN.search(query))
+
+
+def reciprocal_rank_fusion(result_lists: List[List[dict]], k: int = 60) -> List[dict]:
+    """
+    Merge ranked result lists by reciprocal rank (sum of 1 / (k + rank)).
+    
+    Results are matched by document and chunk position; the fused score
+    replaces the original ones, which aren't comparable across retrievers.
+    """
+    fused: Dict[tuple, dict] = {}
+    for results in result_lists:
+        for rank, result in enumerate(results, start=1):
+            key = (result.get("document_id"), result.get("chunk_index"))
+            entry = fused.setdefault(key, {**result, "score": 0.0})
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda r: r["score"], reverse=True)
+
+
+def chunk_payload(
+    document_id: int,
+    user_id: int,
+    document_type: Optional[str],
+    chunk_index: int,
+    chunk_hash: str
+) -> dict:
+    """
+    Qdrant payload of a chunk: IDs and filter fields only.
+    
+    Chunk text lives in the ``knowledge_base`` table (see ``ChunkStore``).
+    """
+    return {
+        "document_id": document_id,
+        "chunk_index": chunk_index,
+        "text_hash": chunk_hash,
+        "user_id": user_id,
+        "file_type": document_type or "unknown"
+    }
+
+
+class _IndexRun:
+    """Bookkeeping for one streaming index_document run."""
+    
+    def __init__(
+        self,
+        document: Document,
+        existing: Dict[str, dict],
+        stored: Set[str],
+        cache: Optional[EmbeddingCache]
+    ):
+        self.document = document
+        self.existing = existing
+        self.stored = stored
+        self.cache = cache
+        self.seen_ids: Set[str] = set()
+        self.occurrences: Dict[str, int] = {}
+        self.writer: Optional[asyncio.Task] = None
+        self.total = 0
+        self.embedded = 0
+        self.cache_hits = 0
+    
+    def point_id(self, chunk_hash: str) -> str:
+        """
+        Content-addressed point ID, stable across edits elsewhere in the document.
+        
+        Repeated chunk texts get an occurrence counter so they don't collide.
+        """
+        occurrence = self.occurrences.get(chunk_hash, 0)
+        self.occurrences[chunk_hash] = occurrence + 1
+        return str(uuid.uuid5(uuid.NAMESPACE_DNS, f"{self.document.id}_{chunk_hash}_{occurrence}"))
+
 
 class RAGService:
     """Service for RAG operations - indexing and retrieving documents."""
@@ -23,47 +596,55 @@ class RAGService:
     def __init__(self, db: AsyncSession):
         """Initialize RAG service."""
         self.db = db
-        self.qdrant_client = QdrantClient(
-            url=settings.qdrant_url,
-            timeout=30
-        )
-        self.embeddings = OpenAIEmbeddings(
-            openai_api_key=settings.openai_api_key,
-            model="text-embedding-3-small"
-        ) if settings.openai_api_key else None
-        
-        self.collection_name = "documents"
-        self._ensure_collection()
+        self.qdrant_client = get_qdrant_client()
+        self.embeddings = get_embeddings()
+        self.query_embeddings = get_query_embeddings()
+        self.model_key = get_embedding_model_key()
+        self.chunk_store = ChunkStore(db)
+        self.collection_name = COLLECTION_NAME
     
-    def _ensure_collection(self):
-        """Ensure Qdrant collection exists."""
-        try:
-            collections = self.qdrant_client.get_collections()
-            collection_names = [c.name for c in collections.collections]
-            
-            if self.collection_name not in collection_names:
-                # Create collection with OpenAI embedding dimensions (1536)
-                self.qdrant_client.create_collection(
-                    collection_name=self.collection_name,
-                    vectors_config=VectorParams(size=1536, distance=Distance.COSINE)
-                )
-                logger.info(f"Created Qdrant collection: {self.collection_name}")
-        except Exception as e:
-            logger.warning(f"Could not ensure collection: {e}")
+    @property
+    def async_qdrant_client(self) -> AsyncQdrantClient:
+        """Async client for the retrieval path so searches don't block the event loop."""
+        return get_async_qdrant_client()
+    
+    async def _use_active_collection(self) -> None:
+        """Point this service at the served collection and the embeddings it was built with."""
+        global _collection_retry_at
+        if not _collection_ready and time.monotonic() >= _collection_retry_at:
+            # Startup ran before Qdrant was reachable
+            _collection_retry_at = time.monotonic() + COLLECTION_RETRY_INTERVAL
+            await asyncio.to_thread(ensure_collection)
+        active = await get_active_collection(self.db)
+        self.collection_name = active.name
+        self.embeddings = get_embeddings(active.spec)
+        self.query_embeddings = get_query_embeddings(active.spec)
+        self.model_key = get_embedding_model_key(active.spec)
     
     async def index_document(
         self,
         document_id: int,
         preserve_markdown: bool = False,
-        process_wiki_links: bool = False
+        process_wiki_links: bool = False,
+        incremental: bool = True
     ) -> bool:
         """
         Index a document in the vector database.
         
+        Text is streamed from extraction through token-aware chunking,
+        embedding and upsert in windows of ``settings.index_window_inputs``
+        chunks, so memory stays flat regardless of document size; each
+        window's Qdrant write overlaps the next window's embedding requests.
+        
+        In incremental mode the new chunk set is diffed against the points
+        already stored for the document: only new chunks are embedded and
+        upserted, and points for removed chunks are deleted.
+        
         Args:
             document_id: Document ID to index
             preserve_markdown: Keep markdown formatting
             process_wiki_links: Process wiki-style links
+            incremental: Diff against stored points instead of rebuilding
             
         Returns:
             True if successful
@@ -75,169 +656,407 @@ class RAGService:
                 logger.error(f"Document not found: {document_id}")
                 return False
             
+            await self._use_active_collection()
+            
             # Skip if no embeddings available
             if not self.embeddings:
                 logger.warning("No embeddings model configured, skipping indexing")
                 return False
             
-            # Read document content
-            try:
-                content = await self._extract_text(document.file_path, document.original_filename)
-                if not content:
-                    logger.warning(f"Extracted content is empty for document {document_id}")
-                    return False
-            except Exception as e:
-                logger.error(f"Error reading document {document_id}: {e}")
-                return False
+            client = self.async_qdrant_client
             
-            # Split into chunks
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200
-            )
-            chunks = text_splitter.split_text(content)
-            
-            if not chunks:
-                logger.warning(f"No chunks created for document {document_id}")
-                return False
+            # Diff against what is already stored for this document
+            if incremental:
+                existing = await self._get_indexed_points(document_id)
+                stored = await self.chunk_store.get_vector_ids(document_id)
+            else:
+                existing, stored = {}, set()
+                await client.delete(
+                    collection_name=self.collection_name,
+                    points_selector=FilterSelector(filter=self._document_filter(document_id))
+                )
+                await self.chunk_store.delete_document(document_id)
+                await self.db.commit()
             
-            # Generate embeddings in batches to avoid token limits
-            # OpenAI has a max of 300k tokens per request
-            MAX_CHUNKS_PER_BATCH = 100  # ~100k tokens with 1000 char chunks
-            embeddings = []
+            run = _IndexRun(
+                document=document,
+                existing=existing,
+                stored=stored,
+                cache=EmbeddingCache(self.db, self.model_key) if settings.embedding_cache_enabled else None
+            )
             
             try:
-                for i in range(0, len(chunks), MAX_CHUNKS_PER_BATCH):
-                    batch = chunks[i:i + MAX_CHUNKS_PER_BATCH]
-                    logger.info(f"Processing batch {i//MAX_CHUNKS_PER_BATCH + 1}/{(len(chunks)-1)//MAX_CHUNKS_PER_BATCH + 1} ({len(batch)} chunks)")
-                    batch_embeddings = self.embeddings.embed_documents(batch)
-                    embeddings.extend(batch_embeddings)
+                # Local models count (and truncate) in their own tokens
+                max_tokens = getattr(self.embeddings, "max_tokens", None)
+                chunker = TokenChunker(
+                    chunk_tokens=min(settings.chunk_tokens, max_tokens) if max_tokens else None,
+                    markdown=preserve_markdown or document.document_type == "markdown",
+                    encoding=getattr(self.embeddings, "encoding", None)
+                )
+                segments = iter_text_segments(document.file_path, document.original_filename)
+                # Windows are sized for memory (texts and vectors held until
+                # written); the dispatcher splits each into API-sized requests
+                window_size = max(settings.index_window_inputs, 1)
+                window = []
+                async for chunk in chunker.stream(segments):
+                    window.append(chunk)
+                    if len(window) >= window_size:
+                        await self._index_window(run, window)
+                        window = []
+                if window:
+                    await self._index_window(run, window)
+                if run.writer:
+                    await run.writer
             except Exception as e:
-                logger.error(f"Error generating embeddings: {e}")
+                if run.writer and not run.writer.done():
+                    run.writer.cancel()
+                logger.error(f"Error indexing chunks of document {document_id}: {e}")
+                # Windows written before the failure are already searchable
+                await invalidate_user_answers(document.user_id)
                 return False
             
-            # Index in Qdrant
-            points = []
-            for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                # Generate deterministic UUID for point ID
-                point_id = str(uuid.uuid5(uuid.NAMESPACE_DNS, f"{document_id}_{idx}"))
-                
-                point = PointStruct(
-                    id=point_id,
-                    vector=embedding,
-                    payload={
-                        "document_id": document_id,
-                        "chunk_index": idx,
-                        "text": chunk,
-                        "filename": document.original_filename,
-                        "user_id": document.user_id,
-                        "file_type": document.document_type or "unknown"
-                    }
+            if run.total == 0:
+                logger.warning(f"No chunks created for document {document_id}")
+                return False
+            
+            # Drop points and stored texts for chunks that no longer exist
+            stale_ids = list(set(existing) - run.seen_ids)
+            if stale_ids:
+                await client.delete(
+                    collection_name=self.collection_name,
+                    points_selector=PointIdsList(points=stale_ids)
                 )
-                points.append(point)
+            await self.chunk_store.delete((stored | set(existing)) - run.seen_ids)
             
-            self.qdrant_client.upsert(
-                collection_name=self.collection_name,
-                points=points
+            logger.info(
+                f"Document {document_id}: {run.total} chunks, {run.embedded} new, "
+                f"{run.cache_hits} from cache, {len(stale_ids)} stale"
             )
             
             # Update document status
             document.is_indexed = True
             await self.db.commit()
             await self.db.refresh(document)
+            await invalidate_user_answers(document.user_id)
             
-            logger.info(f"Indexed document {document_id}: {len(chunks)} chunks")
+            logger.info(f"Indexed document {document_id}: {run.total} chunks")
             return True
             
         except Exception as e:
             logger.error(f"Error indexing document {document_id}: {e}", exc_info=True)
             return False
 
-    async def _extract_text(self, file_path: str, filename: str) -> str:
-        """Extract text from file based on extension."""
-        ext = os.path.splitext(filename)[1].lower()
+    async def delete_document_points(self, document_id: int) -> bool:
+        """
+        Delete all points of a document from the served collection.
         
+        Returns:
+            True if successful (leftovers are removed by the reconciler otherwise)
+        """
         try:
-            if ext == '.pdf':
-                return self._extract_pdf(file_path)
-            elif ext in ['.docx', '.doc']:
-                return self._extract_docx(file_path)
-            else:
-                # Default to text
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    return f.read()
+            await self._use_active_collection()
+            await self.async_qdrant_client.delete(
+                collection_name=self.collection_name,
+                points_selector=FilterSelector(filter=self._document_filter(document_id))
+            )
+            return True
         except Exception as e:
-            logger.error(f"Failed to extract text from {filename}: {e}")
-            return ""
-
-    def _extract_pdf(self, file_path: str) -> str:
-        """Extract text from PDF."""
-        text = ""
-        with open(file_path, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-        return text
-
-    def _extract_docx(self, file_path: str) -> str:
-        """Extract text from DOCX."""
-        doc = docx.Document(file_path)
-        return "\n".join([para.text for para in doc.paragraphs])
-    
-    def search(
+            logger.error(f"Error deleting points of document {document_id}: {e}")
+            return False
+
+    async def _index_window(self, run: "_IndexRun", window: List[TextChunk]) -> None:
+        """Embed one window of chunks and schedule its Qdrant write."""
+        document = run.document
+        start = run.total
+        run.total += len(window)
+        
+        chunk_hashes = [text_hash(chunk.text) for chunk in window]
+        point_ids = [run.point_id(chunk_hash) for chunk_hash in chunk_hashes]
+        run.seen_ids.update(point_ids)
+        
+        to_embed = [i for i, point_id in enumerate(point_ids) if point_id not in run.existing]
+        moved = [
+            i for i, point_id in enumerate(point_ids)
+            if point_id in run.existing and run.existing[point_id].get("chunk_index") != start + i
+        ]
+        
+        # Reuse cached vectors for unchanged chunks, only embed new text
+        embed_hashes = [chunk_hashes[i] for i in to_embed]
+        vectors = await run.cache.get_many(embed_hashes) if run.cache and embed_hashes else {}
+        run.cache_hits += len([h for h in embed_hashes if h in vectors])
+        
+        pending = {}
+        for i in to_embed:
+            if chunk_hashes[i] not in vectors:
+                pending.setdefault(chunk_hashes[i], window[i])
+        
+        if pending:
+            logger.info(f"Embedding chunks {start}-{start + len(window) - 1} ({len(pending)} new)")
+            new_vectors = dict(zip(
+                pending.keys(),
+                await embed_documents(
+                    self.embeddings,
+                    [chunk.text for chunk in pending.values()],
+                    token_counts=[chunk.tokens for chunk in pending.values()]
+                )
+            ))
+            run.embedded += len(new_vectors)
+            if run.cache:
+                await run.cache.put_many(new_vectors)
+            vectors.update(new_vectors)
+        
+        # Texts go to Postgres and are committed before the points are written,
+        # so every point in Qdrant can be hydrated
+        to_store = sorted(set(to_embed) | set(moved) | {
+            i for i, point_id in enumerate(point_ids) if point_id not in run.stored
+        })
+        if to_store:
+            await self.chunk_store.upsert([
+                {
+                    "vector_id": point_ids[i],
+                    "document_id": document.id,
+                    "content": window[i].text,
+                    "meta_data": {
+                        "chunk_index": start + i,
+                        "heading": window[i].heading,
+                        "text_hash": chunk_hashes[i],
+                    },
+                }
+                for i in to_store
+            ])
+            await self.db.commit()
+            run.stored.update(point_ids[i] for i in to_store)
+        
+        operations = []
+        if to_embed:
+            operations.append(UpsertOperation(upsert=PointsList(points=[
+                PointStruct(
+                    id=point_ids[i],
+                    vector=vectors[chunk_hashes[i]],
+                    payload=self._chunk_payload(document, start + i, chunk_hashes[i])
+                )
+                for i in to_embed
+            ])))
+        for i in moved:
+            operations.append(SetPayloadOperation(set_payload=SetPayload(
+                payload={"chunk_index": start + i},
+                points=[point_ids[i]]
+            )))
+        
+        # Keep at most one write in flight: wait for the previous window's
+        # upsert, then start this one while the caller embeds the next window
+        if run.writer:
+            await run.writer
+            run.writer = None
+        if operations:
+            run.writer = asyncio.create_task(self.async_qdrant_client.batch_update_points(
+                collection_name=self.collection_name,
+                update_operations=operations
+            ))
+
+    @staticmethod
+    def _document_filter(document_id: int) -> Filter:
+        """Qdrant filter matching all points of a document."""
+        return Filter(must=[FieldCondition(key="document_id", match=MatchValue(value=document_id))])
+
+    @staticmethod
+    def _chunk_payload(document: Document, idx: int, chunk_hash: str) -> dict:
+        """Payload stored alongside a chunk vector."""
+        return chunk_payload(document.id, document.user_id, document.document_type, idx, chunk_hash)
+
+    async def _get_indexed_points(self, document_id: int) -> dict:
+        """Scroll the stored points of a document (payload only, no vectors)."""
+        points = {}
+        offset = None
+        while True:
+            records, offset = await self.async_qdrant_client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=self._document_filter(document_id),
+                with_payload=["chunk_index"],
+                with_vectors=False,
+                limit=256,
+                offset=offset
+            )
+            for record in records:
+                points[str(record.id)] = record.payload or {}
+            if offset is None:
+                break
+        return points
+
+    async def embed_query(self, query: str) -> List[float]:
+        """Embed a search query (cached, concurrent queries coalesced)."""
+        await self._use_active_collection()
+        return await embed_query(self.query_embeddings, query, self.model_key)
+    
+    async def search(
         self,
         query: str,
         user_id: int,
-        limit: int = 5
+        limit: int = 5,
+        query_vector: Optional[List[float]] = None
     ) -> List[dict]:
         """
         Search for relevant document chunks.
         
+        In hybrid mode, Postgres full-text results are fused with vector
+        results by reciprocal rank. Short identifier queries (numbers,
+        quoted names, codes) whose terms all occur in stored chunks are
+        answered from full-text search alone, without embedding or ANN search.
+        
         Args:
             query: Search query
             user_id: User ID to filter by
             limit: Number of results
+            query_vector: Precomputed query embedding, if the caller has one
             
         Returns:
             List of search results with text and metadata
         """
         try:
+            await self._use_active_collection()
+            
+            lexical_results, conclusive = await self._lexical_search(query, user_id, limit)
+            if conclusive:
+                return lexical_results
+            
             if not self.embeddings:
                 logger.warning("No embeddings model configured")
-                return []
+                return lexical_results
             
-            # Generate query embedding
-            query_embedding = self.embeddings.embed_query(query)
+            query_embedding = query_vector or await self.embed_query(query)
             
             # Search in Qdrant
-            from qdrant_client.models import Filter, FieldCondition, MatchValue
-            
-            search_results = self.qdrant_client.search(
+            search_results = await self.async_qdrant_client.search(
                 collection_name=self.collection_name,
                 query_vector=query_embedding,
-                query_filter=Filter(
-                    must=[
-                        FieldCondition(
-                            key="user_id",
-                            match=MatchValue(value=user_id)
-                        )
-                    ]
-                ),
+                query_filter=self._user_filter(user_id),
+                search_params=get_search_params(),
                 limit=limit
             )
+            vector_results = await self._hydrate(search_results)
             
-            # Format results
-            results = []
-            for result in search_results:
-                results.append({
-                    "text": result.payload.get("text", ""),
-                    "score": result.score,
-                    "document_id": result.payload.get("document_id"),
-                    "filename": result.payload.get("filename", ""),
-                })
-            
-            return results
+            if not settings.rag_hybrid_search:
+                return vector_results
+            return reciprocal_rank_fusion([vector_results, lexical_results], settings.rag_rrf_k)[:limit]
             
         except Exception as e:
             logger.error(f"Error searching: {e}", exc_info=True)
             return []
+    
+    async def search_batch(
+        self,
+        queries: List[str],
+        user_id: int,
+        limit: int = 5
+    ) -> List[List[dict]]:
+        """
+        Run several searches with one embeddings call and one Qdrant request.
+        
+        Each query gets the same results as ``search``: identifier queries
+        answered by the lexical fast path skip embedding, the rest are fused
+        with full-text results in hybrid mode.
+        
+        Args:
+            queries: Search queries
+            user_id: User ID to filter by
+            limit: Number of results per query
+            
+        Returns:
+            One list of search results per query, in the same order
+        """
+        try:
+            await self._use_active_collection()
+            
+            # Sequential: the session can't run queries concurrently
+            lexical = [await self._lexical_search(query, user_id, limit) for query in queries]
+            results = [lexical_results for lexical_results, _ in lexical]
+            pending = [i for i, (_, conclusive) in enumerate(lexical) if not conclusive]
+            if not pending:
+                return results
+            if not self.embeddings:
+                logger.warning("No embeddings model configured")
+                return results
+            
+            vectors = await embed_queries(self.query_embeddings, [queries[i] for i in pending], self.model_key)
+            
+            user_filter = self._user_filter(user_id)
+            search_params = get_search_params()
+            batch_results = await self.async_qdrant_client.search_batch(
+                collection_name=self.collection_name,
+                requests=[
+                    SearchRequest(
+                        vector=vector,
+                        filter=user_filter,
+                        params=search_params,
+                        limit=limit,
+                        with_payload=True
+                    )
+                    for vector in vectors
+                ]
+            )
+            
+            # One Postgres query for the texts of all queries' hits
+            chunks = await self.chunk_store.hydrate(
+                str(hit.id) for hits in batch_results for hit in hits
+            )
+            for i, hits in zip(pending, batch_results):
+                vector_results = self._format_hits(hits, chunks)
+                if settings.rag_hybrid_search:
+                    vector_results = reciprocal_rank_fusion([vector_results, results[i]], settings.rag_rrf_k)[:limit]
+                results[i] = vector_results
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error in batch search: {e}", exc_info=True)
+            return [[] for _ in queries]
+    
+    async def _lexical_search(self, query: str, user_id: int, limit: int) -> Tuple[List[dict], bool]:
+        """
+        Full-text results of hybrid search.
+        
+        Returns:
+            Results and whether they are conclusive (lexical fast path), in
+            which case vector search is skipped
+        """
+        if not settings.rag_hybrid_search:
+            return [], False
+        if is_identifier_query(query):
+            results = await self.chunk_store.lexical_search(query, user_id, limit, match_all=True)
+            if results:
+                logger.debug(f"Lexical fast path: {len(results)} results")
+                return results, True
+        return await self.chunk_store.lexical_search(query, user_id, limit, match_all=False), False
+    
+    @staticmethod
+    def _user_filter(user_id: int) -> Filter:
+        return Filter(
+            must=[
+                FieldCondition(
+                    key="user_id",
+                    match=MatchValue(value=user_id)
+                )
+            ]
+        )
+    
+    async def _hydrate(self, hits) -> List[dict]:
+        """Attach chunk texts from Postgres to Qdrant hits."""
+        chunks = await self.chunk_store.hydrate(str(hit.id) for hit in hits)
+        return self._format_hits(hits, chunks)
+    
+    @staticmethod
+    def _format_hits(hits, chunks: Dict[str, dict]) -> List[dict]:
+        results = []
+        for hit in hits:
+            # Points indexed before the chunk store still carry their text
+            chunk = chunks.get(str(hit.id)) or hit.payload
+            if not chunk.get("text"):
+                logger.warning(f"No stored text for point {hit.id}, skipping")
+                continue
+            results.append({
+                "text": chunk["text"],
+                "score": hit.score,
+                "document_id": hit.payload.get("document_id"),
+                "filename": chunk.get("filename", ""),
+                "chunk_index": hit.payload.get("chunk_index"),
+            })
+        return results
@@ -0,0 +1,291 @@
+"""Re-embedding of stored chunks into a versioned shadow collection."""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+
+from qdrant_client.models import (
+    CollectionStatus,
+    CreateAlias,
+    CreateAliasOperation,
+    DeleteAlias,
+    DeleteAliasOperation,
+    OptimizersConfigDiff,
+    PointIdsList,
+    PointStruct,
+    SetPayload,
+    SetPayloadOperation,
+)
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from db.models import Document, KnowledgeBase, VectorCollection
+from services.embedding_cache import EmbeddingCache, text_hash
+from services.embedding_dispatcher import AdaptiveConcurrencyLimiter, embed_documents
+from services.rag_service import (
+    COLLECTION_ALIAS,
+    COLLECTION_NAME,
+    EmbeddingSpec,
+    chunk_payload,
+    create_collection,
+    get_async_qdrant_client,
+    get_embedding_dimensions,
+    get_embedding_model_key,
+    get_embeddings,
+    get_qdrant_client,
+    reset_active_collection,
+)
+
+logger = logging.getLogger(__name__)
+
+# Optimizer threshold restored once the bulk load is done (Qdrant's default, in KB)
+INDEXING_THRESHOLD = 20000
+# Page size when diffing the shadow collection against the chunk store
+RECONCILE_PAGE_SIZE = 1000
+# Seconds between collection status polls while HNSW is being built
+STATUS_POLL_INTERVAL = 5
+
+
+class ReembeddingJob:
+    """
+    Builds a new collection from the chunk store and switches the alias to it.
+
+    Searches keep hitting the current collection until the swap. The job
+    embeds ``knowledge_base`` rows in id order under its own, lower
+    concurrency limit and checkpoints the last embedded id after every
+    page, so an interrupted or time-boxed run resumes where it stopped.
+    Chunks changed by live indexing meanwhile are caught up by a final
+    diff against the chunk store before and after the swap.
+    """
+
+    def __init__(self, db: AsyncSession):
+        """Initialize job."""
+        self.db = db
+        self.client = get_async_qdrant_client()
+
+    async def start(self, spec: EmbeddingSpec) -> VectorCollection:
+        """
+        Register and create an empty shadow collection for the given embeddings.
+
+        Raises:
+            ValueError: If another collection is still being built
+        """
+        building = await self.db.scalar(
+            select(VectorCollection).where(VectorCollection.status == "building")
+        )
+        if building:
+            raise ValueError(f"Collection {building.name} is still being built")
+
+        vector_size = get_embedding_dimensions(spec)
+        record = VectorCollection(
+            name=f"{COLLECTION_NAME}_{datetime.utcnow():%Y%m%d%H%M%S}",
+            embedding_backend=spec.backend,
+            embedding_model=spec.model,
+            dimensions=spec.dimensions,
+            vector_size=vector_size,
+            status="building",
+            checkpoint=0
+        )
+        # HNSW is built once at the end instead of continuously during the bulk load
+        await asyncio.to_thread(create_collection, get_qdrant_client(), record.name, vector_size, 0)
+        self.db.add(record)
+        await self.db.commit()
+        logger.info(f"Started re-embedding into {record.name} ({spec.backend}:{spec.model}, {vector_size} dims)")
+        return record
+
+    async def run(self, collection_id: int, time_budget: Optional[float] = None) -> bool:
+        """
+        Continue building a collection and activate it when complete.
+
+        Args:
+            collection_id: VectorCollection ID
+            time_budget: Seconds to work before checkpointing (default from settings)
+
+        Returns:
+            True when the collection is active, False if the budget ran out first
+        """
+        record = await self.db.get(VectorCollection, collection_id)
+        if not record or record.status != "building":
+            return True
+
+        deadline = time.monotonic() + (time_budget or settings.reembed_time_budget)
+        spec = EmbeddingSpec(record.embedding_backend, record.embedding_model, record.dimensions)
+
+        if not await self._copy(record, spec, deadline):
+            return False
+        await self._reconcile(record.name)
+        # Chunks indexed while reconciling
+        await self._copy(record, spec)
+        if not await self._build_index(record.name, deadline):
+            return False
+
+        await self._activate(record)
+
+        # Other processes serve the old collection until their resolved alias expires
+        await asyncio.sleep(settings.qdrant_alias_cache_ttl + STATUS_POLL_INTERVAL)
+        await self._copy(record, spec)
+        await self._reconcile(record.name)
+
+        if record.previous_collection and record.previous_collection != record.name:
+            await self.client.delete_collection(record.previous_collection)
+            logger.info(f"Deleted previous collection {record.previous_collection}")
+        return True
+
+    async def _copy(self, record: VectorCollection, spec: EmbeddingSpec, deadline: Optional[float] = None) -> bool:
+        """Embed chunk store rows past the checkpoint into the collection."""
+        embeddings = get_embeddings(spec)
+        if embeddings is None:
+            raise ValueError(f"Embeddings {spec.backend}:{spec.model} are not available")
+        limiter = AdaptiveConcurrencyLimiter(settings.reembed_concurrency)
+        cache = EmbeddingCache(self.db, get_embedding_model_key(spec)) if settings.embedding_cache_enabled else None
+
+        while True:
+            if deadline and time.monotonic() > deadline:
+                logger.info(f"Re-embedding of {record.name} checkpointed at chunk {record.checkpoint}")
+                return False
+
+            result = await self.db.execute(
+                select(
+                    KnowledgeBase.id,
+                    KnowledgeBase.vector_id,
+                    KnowledgeBase.content,
+                    KnowledgeBase.meta_data,
+                    KnowledgeBase.document_id,
+                    Document.user_id,
+                    Document.document_type
+                )
+                .join(Document, Document.id == KnowledgeBase.document_id)
+                .where(KnowledgeBase.id > record.checkpoint, KnowledgeBase.vector_id.isnot(None))
+                .order_by(KnowledgeBase.id)
+                .limit(settings.reembed_page_size)
+            )
+            rows = result.all()
+            if not rows:
+                return True
+
+            hashes = [(row.meta_data or {}).get("text_hash") or text_hash(row.content) for row in rows]
+            vectors = await cache.get_many(hashes) if cache else {}
+            pending = {}
+            for row, chunk_hash in zip(rows, hashes):
+                if chunk_hash not in vectors:
+                    pending.setdefault(chunk_hash, row.content)
+            if pending:
+                new_vectors = dict(zip(
+                    pending.keys(),
+                    await embed_documents(embeddings, list(pending.values()), limiter=limiter)
+                ))
+                if cache:
+                    await cache.put_many(new_vectors)
+                vectors.update(new_vectors)
+
+            await self.client.upsert(
+                collection_name=record.name,
+                points=[
+                    PointStruct(
+                        id=row.vector_id,
+                        vector=vectors[chunk_hash],
+                        payload=chunk_payload(
+                            row.document_id,
+                            row.user_id,
+                            row.document_type,
+                            (row.meta_data or {}).get("chunk_index"),
+                            chunk_hash
+                        )
+                    )
+                    for row, chunk_hash in zip(rows, hashes)
+                ],
+                wait=True
+            )
+
+            record.checkpoint = rows[-1].id
+            await self.db.commit()
+
+    async def _reconcile(self, collection_name: str) -> None:
+        """Drop points whose chunk is gone and fix positions of chunks that moved."""
+        removed = moved = 0
+        offset = None
+        while True:
+            records, offset = await self.client.scroll(
+                collection_name=collection_name,
+                with_payload=["chunk_index"],
+                with_vectors=False,
+                limit=RECONCILE_PAGE_SIZE,
+                offset=offset
+            )
+            if records:
+                result = await self.db.execute(
+                    select(KnowledgeBase.vector_id, KnowledgeBase.meta_data)
+                    .where(KnowledgeBase.vector_id.in_([str(r.id) for r in records]))
+                )
+                stored = {row.vector_id: (row.meta_data or {}).get("chunk_index") for row in result}
+
+                missing = [str(r.id) for r in records if str(r.id) not in stored]
+                operations = [
+                    SetPayloadOperation(set_payload=SetPayload(
+                        payload={"chunk_index": stored[str(r.id)]},
+                        points=[str(r.id)]
+                    ))
+                    for r in records
+                    if str(r.id) in stored and (r.payload or {}).get("chunk_index") != stored[str(r.id)]
+                ]
+                if missing:
+                    await self.client.delete(
+                        collection_name=collection_name,
+                        points_selector=PointIdsList(points=missing)
+                    )
+                if operations:
+                    await self.client.batch_update_points(
+                        collection_name=collection_name,
+                        update_operations=operations
+                    )
+                removed += len(missing)
+                moved += len(operations)
+            if offset is None:
+                break
+        logger.info(f"Reconciled {collection_name}: {removed} removed, {moved} moved")
+
+    async def _build_index(self, collection_name: str, deadline: float) -> bool:
+        """Enable HNSW building and wait until the collection is fully indexed."""
+        await self.client.update_collection(
+            collection_name=collection_name,
+            optimizers_config=OptimizersConfigDiff(indexing_threshold=INDEXING_THRESHOLD)
+        )
+        while time.monotonic() < deadline:
+            info = await self.client.get_collection(collection_name)
+            if info.status == CollectionStatus.GREEN:
+                return True
+            await asyncio.sleep(STATUS_POLL_INTERVAL)
+        logger.info(f"Index of {collection_name} still building, will check again")
+        return False
+
+    async def _activate(self, record: VectorCollection) -> None:
+        """Atomically point the alias at the new collection."""
+        previous = None
+        response = await self.client.get_aliases()
+        for alias in response.aliases:
+            if alias.alias_name == COLLECTION_ALIAS:
+                previous = alias.collection_name
+
+        operations = []
+        if previous:
+            operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=COLLECTION_ALIAS)))
+        operations.append(CreateAliasOperation(create_alias=CreateAlias(
+            collection_name=record.name,
+            alias_name=COLLECTION_ALIAS
+        )))
+        # Both operations are applied in one request, so there is no moment without the alias
+        await self.client.update_collection_aliases(change_aliases_operations=operations)
+
+        await self.db.execute(
+            update(VectorCollection)
+            .where(VectorCollection.status == "active")
+            .values(status="retired")
+        )
+        record.status = "active"
+        record.previous_collection = previous
+        record.activated_at = datetime.utcnow()
+        await self.db.commit()
+        reset_active_collection()
+        logger.info(f"Alias {COLLECTION_ALIAS} switched from {previous} to {record.name}")
@@ -0,0 +1,184 @@
+"""Text extraction from uploaded files, run off the event loop in a bounded process pool."""
+import asyncio
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional
+
+import PyPDF2
+import docx
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Pages handed to a worker per job; ranges of one PDF are parsed in parallel
+PDF_PAGE_RANGE_SIZE = 25
+# Characters read per block from plain text files
+PLAIN_TEXT_BLOCK_SIZE = 64 * 1024
+
+_pool: Optional[ProcessPoolExecutor] = None
+_warned_no_pool = False
+
+
+class ExtractionTimeout(TimeoutError):
+    """Raised when a file takes longer than the configured extraction timeout."""
+
+
+# --- Worker side (runs in pool processes, must stay picklable/top-level) ---
+
+def _init_worker(max_memory_mb: int):
+    """Cap the address space of a pool worker so one bad file can't eat the host."""
+    if max_memory_mb <= 0:
+        return
+    try:
+        import resource
+        limit = max_memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def _pdf_page_count(file_path: str) -> int:
+    with open(file_path, 'rb') as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def _pdf_pages(file_path: str, start: int, stop: int) -> List[str]:
+    with open(file_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        return [(reader.pages[i].extract_text() or "") + "\n" for i in range(start, stop)]
+
+
+def _docx_text(file_path: str) -> str:
+    doc = docx.Document(file_path)
+    return "\n".join(para.text for para in doc.paragraphs)
+
+
+# --- Pool management ---
+
+def _can_fork_workers() -> bool:
+    # Celery prefork children are daemonic and may not start processes of their own
+    return not multiprocessing.current_process().daemon
+
+
+def get_extraction_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Get the process-wide extraction pool, or None if subprocesses aren't allowed here.
+
+    Without a pool (Celery prefork children) extraction runs on threads: no
+    memory cap, and a timed-out extraction keeps running until it finishes.
+    The indexing queue is therefore consumed by a ``--pool=solo`` worker.
+    """
+    global _pool, _warned_no_pool
+    if not _can_fork_workers():
+        if not _warned_no_pool:
+            logger.warning(
+                "Text extraction runs on threads without memory limits in this daemonic process; "
+                "consume the indexing queue with a --pool=solo worker"
+            )
+            _warned_no_pool = True
+        return None
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.extraction_workers,
+            # spawn: the API process has live threads and an event loop, forking it is unsafe
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(settings.extraction_max_memory_mb,)
+        )
+    return _pool
+
+
+def _kill_pool():
+    """Terminate pool workers (e.g. stuck on a pathological file) and start fresh next time."""
+    global _pool
+    pool, _pool = _pool, None
+    if pool is None:
+        return
+    for process in list(getattr(pool, "_processes", {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_extraction_pool():
+    """Shut down the extraction pool on application exit."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# --- Public API ---
+
+async def iter_text_segments(file_path: str, filename: str) -> AsyncIterator[str]:
+    """
+    Stream extracted text in order, one segment at a time.
+
+    PDFs are parsed in page ranges across the pool's workers and yielded
+    page by page as ranges complete; plain text is read in blocks and
+    DOCX files yield a single segment.
+    Waiting on extraction may take at most ``settings.extraction_timeout``
+    seconds per file in total; time the consumer spends between segments
+    (embedding, upserting) doesn't count.
+
+    Raises:
+        ExtractionTimeout: If the file exceeds the timeout
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_extraction_pool()
+    waited = 0.0
+    pending = deque()
+
+    def submit(func, *args):
+        if pool is None:
+            return asyncio.ensure_future(asyncio.to_thread(func, *args))
+        return loop.run_in_executor(pool, func, *args)
+
+    async def wait(future, in_pool: bool = True):
+        nonlocal waited
+        started = loop.time()
+        try:
+            return await asyncio.wait_for(future, max(settings.extraction_timeout - waited, 0))
+        except asyncio.TimeoutError:
+            for other in pending:
+                other.cancel()
+            # Only a stuck pool worker needs killing; thread reads just stop
+            if pool is not None and in_pool:
+                _kill_pool()
+            raise ExtractionTimeout(f"Extraction of {filename} exceeded {settings.extraction_timeout}s")
+        finally:
+            waited += loop.time() - started
+
+    ext = os.path.splitext(filename)[1].lower()
+
+    if ext == '.pdf':
+        page_count = await wait(submit(_pdf_page_count, file_path))
+        in_flight = max(settings.extraction_workers, 1)
+        ranges = deque(
+            (start, min(start + PDF_PAGE_RANGE_SIZE, page_count))
+            for start in range(0, page_count, PDF_PAGE_RANGE_SIZE)
+        )
+        while ranges or pending:
+            while ranges and len(pending) < in_flight:
+                pending.append(submit(_pdf_pages, file_path, *ranges.popleft()))
+            pages = await wait(pending.popleft())
+            for page in pages:
+                yield page
+    elif ext in ['.docx', '.doc']:
+        yield await wait(submit(_docx_text, file_path))
+    else:
+        # Plain text is I/O bound, read it in blocks on a thread
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            while True:
+                block = await wait(asyncio.to_thread(f.read, PLAIN_TEXT_BLOCK_SIZE), in_pool=False)
+                if not block:
+                    break
+                yield block
+
+
+async def extract_text(file_path: str, filename: str) -> str:
+    """Extract the full text of a file (see ``iter_text_segments``)."""
+    return "".join([segment async for segment in iter_text_segments(file_path, filename)])
@@ -18,7 +18,7 @@ from db.cloud_storage_models import (
 from services.yandex_disk_service import YandexDiskService
 from services.icloud_service import ObsidianSyncService
 from services.document_service import DocumentService
-from services.rag_service import RAGService
+from services.indexing_queue import PRIORITY_SYNC, IndexingQueue
 from config import settings
 
 logger = logging.getLogger(__name__)
@@ -157,8 +157,6 @@ async def _sync_yandex_disk_async(
                         
                         if success and storage.process_documents:
                             # Process document (add to knowledge base)
-                            rag_service = RAGService(db)
-                            
                             # Get or create folder hierarchy
                             from services.folder_service import FolderService
                             folder_service = FolderService(db)
@@ -190,12 +188,11 @@ async def _sync_yandex_disk_async(
                                 )
                                 job.new_files += 1
                             
-                            # Index in RAG
-                            await rag_service.index_document(document.id)
+                            # Index in RAG (deduplicated with uploads and re-index requests)
+                            await IndexingQueue(db).enqueue(document.id, priority=PRIORITY_SYNC)
                             
                             file_op.document_id = document.id
                             file_op.is_processed = True
-                            file_op.is_indexed = True
                         
                         file_op.status = SyncStatus.COMPLETED
                         processed += 1
@@ -342,7 +339,6 @@ async def _sync_obsidian_vault_async(
                         
                         # Process document
                         doc_service = DocumentService(db)
-                        rag_service = RAGService(db)
                         
                         document = await doc_service.create_document(
                             user_id=vault.user_id,
@@ -351,16 +347,11 @@ async def _sync_obsidian_vault_async(
                             metadata=metadata
                         )
                         
-                        # Index with Obsidian-specific processing
-                        await rag_service.index_document(
-                            document.id,
-                            preserve_markdown=vault.preserve_markdown,
-                            process_wiki_links=vault.process_backlinks
-                        )
+                        # Index in RAG; notes are .md documents, so markdown structure is kept
+                        await IndexingQueue(db).enqueue(document.id, priority=PRIORITY_SYNC)
                         
                         file_op.document_id = document.id
                         file_op.is_processed = True
-                        file_op.is_indexed = True
                         job.new_files += 1
                     
                     file_op.status = SyncStatus.COMPLETED
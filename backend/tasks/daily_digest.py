@@ -10,28 +10,10 @@ from db.models import User, Task, CalendarEvent
 from telegram.bot import bot
 from config import settings
 from langchain_core.messages import HumanMessage, SystemMessage
+from services.llm_gateway import get_llm
 
 logger = logging.getLogger(__name__)
 
-# Initialize LLM based on configuration
-def get_llm():
-    """Get LLM instance based on settings."""
-    if settings.use_ollama:
-        from langchain_community.llms import Ollama
-        return Ollama(
-            base_url=settings.ollama_base_url,
-            model=settings.ollama_model,
-            temperature=0.7,
-        )
-    else:
-        from langchain_openai import ChatOpenAI
-        return ChatOpenAI(
-            model=settings.openai_model,
-            temperature=0.7,
-            api_key=settings.openai_api_key
-        )
-
-llm = get_llm()
 
 async def process_daily_digest():
     """Async logic to generate and send daily digests to all users."""
@@ -107,7 +89,7 @@ async def process_daily_digest():
 Расписание пользователя:
 {schedule_text}"""
 
-                llm_response = await llm.ainvoke([SystemMessage(content=system_prompt)])
+                llm_response = await get_llm("digest").ainvoke([SystemMessage(content=system_prompt)])
                 message_text = llm_response.content
                 
                 # Send telegram message
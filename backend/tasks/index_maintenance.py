@@ -0,0 +1,100 @@
+"""Celery tasks for keeping the vector index and its caches in shape."""
+import asyncio
+import logging
+from typing import Optional, Tuple
+
+from celery import shared_task
+from db.session import async_session_factory
+from services.embedding_cache import EmbeddingCache
+from services.rag_service import EmbeddingSpec
+from services.reembedding import ReembeddingJob
+from services.index_reconciler import IndexReconciler
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+async def process_embedding_cache_prune() -> int:
+    """Async logic to evict least recently used embedding cache entries."""
+    async with async_session_factory() as session:
+        cache = EmbeddingCache(session, settings.openai_embedding_model)
+        evicted = await cache.prune(settings.embedding_cache_max_entries)
+        logger.info(f"Embedding cache pruned: {evicted} entries evicted")
+        return evicted
+
+
+@shared_task(name="tasks.prune_embedding_cache")
+def prune_embedding_cache():
+    """
+    Celery task to keep the embedding cache under its size limit.
+    Runs daily.
+    """
+    try:
+        evicted = asyncio.run(process_embedding_cache_prune())
+        return f"Evicted {evicted} entries"
+    except Exception as e:
+        logger.error(f"Error in prune_embedding_cache task: {e}", exc_info=True)
+        return f"Error: {e}"
+
+
+async def process_index_reconciliation() -> dict:
+    """Async logic to repair drift between documents and the vector index."""
+    async with async_session_factory() as session:
+        return await IndexReconciler(session).run()
+
+
+@shared_task(name="tasks.reconcile_index")
+def reconcile_index():
+    """
+    Celery task to delete orphaned points and unflag documents without points.
+    Runs daily.
+    """
+    try:
+        stats = asyncio.run(process_index_reconciliation())
+        return f"Deleted {stats['orphaned_points']} orphaned points, unflagged {stats['unindexed_documents']} documents"
+    except Exception as e:
+        logger.error(f"Error in reconcile_index task: {e}", exc_info=True)
+        return f"Error: {e}"
+
+
+async def process_reembedding(
+    embedding_backend: Optional[str],
+    embedding_model: Optional[str],
+    embedding_dimensions: Optional[int],
+    collection_id: Optional[int]
+) -> Tuple[int, bool]:
+    """Async logic to start or resume building a re-embedded collection."""
+    async with async_session_factory() as session:
+        job = ReembeddingJob(session)
+        if collection_id is None:
+            record = await job.start(EmbeddingSpec(embedding_backend, embedding_model, embedding_dimensions))
+            collection_id = record.id
+        done = await job.run(collection_id)
+        return collection_id, done
+
+
+@shared_task(name="tasks.reembed_collection")
+def reembed_collection(
+    embedding_backend: Optional[str] = None,
+    embedding_model: Optional[str] = None,
+    embedding_dimensions: Optional[int] = None,
+    collection_id: Optional[int] = None
+):
+    """
+    Celery task to re-embed the knowledge base into a new collection.
+    
+    Started with an embedding spec, it creates the shadow collection; each
+    run works for ``settings.reembed_time_budget`` seconds and then
+    requeues itself with the collection ID to resume from its checkpoint.
+    """
+    try:
+        collection_id, done = asyncio.run(process_reembedding(
+            embedding_backend, embedding_model, embedding_dimensions, collection_id
+        ))
+        if not done:
+            reembed_collection.delay(collection_id=collection_id)
+            return f"Collection {collection_id} checkpointed, continuing"
+        return f"Collection {collection_id} is active"
+    except Exception as e:
+        logger.error(f"Error in reembed_collection task: {e}", exc_info=True)
+        return f"Error: {e}"
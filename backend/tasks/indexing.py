@@ -0,0 +1,81 @@
+"""Celery tasks for the document indexing queue."""
+import asyncio
+import html
+import logging
+from typing import Optional
+
+from celery import shared_task
+from db.session import async_session_factory
+from db.models import Document
+from services.indexing_queue import IndexingQueue
+from services.rag_service import RAGService
+from telegram.bot import bot
+
+logger = logging.getLogger(__name__)
+
+
+async def notify_indexing_result(telegram_id: int, document: Document, success: bool):
+    """Tell the Telegram user who sent a document how indexing went."""
+    filename = html.escape(document.original_filename or "")
+    if success:
+        text = (
+            f"✅ Документ <b>{filename}</b> успешно обработан и добавлен в базу знаний!\n"
+            f"Теперь вы можете задавать вопросы по его содержанию."
+        )
+    else:
+        text = (
+            f"⚠️ Документ <b>{filename}</b> сохранен, но не удалось проиндексировать текст. "
+            f"Возможно, формат не поддерживается или файл пуст."
+        )
+    try:
+        await bot.send_message(chat_id=telegram_id, text=text, parse_mode="HTML")
+    except Exception as e:
+        logger.warning(f"Could not notify {telegram_id} about document {document.id}: {e}")
+
+
+async def process_index_document(document_id: int, task_token: Optional[str] = None) -> str:
+    """Async logic to run one queued indexing job."""
+    async with async_session_factory() as session:
+        queue = IndexingQueue(session)
+        job = await queue.claim(document_id, task_token)
+        if job is None:
+            return "skipped (superseded)"
+
+        document = await session.get(Document, document_id)
+        if not document:
+            return "skipped (document deleted)"
+
+        error = None
+        try:
+            success = await RAGService(session).index_document(document_id)
+            if not success:
+                error = "Indexing failed, see worker logs"
+        except Exception as e:
+            success, error = False, str(e)
+
+        try:
+            final = await queue.complete(job, success, error)
+        except Exception as e:
+            # Document (and its job) deleted while indexing
+            logger.info(f"Indexing job of document {document_id} is gone: {e}")
+            return "skipped (document deleted)"
+
+        if final and job.notify_telegram_id:
+            await notify_indexing_result(job.notify_telegram_id, document, success)
+        return job.status
+
+
+@shared_task(name="tasks.index_document", acks_late=True, reject_on_worker_lost=True)
+def index_document(document_id: int, task_token: Optional[str] = None):
+    """
+    Celery task to index one document from the indexing queue.
+
+    Acknowledged only after the run, so a job survives worker restarts;
+    retries and reruns are scheduled by ``IndexingQueue.complete``.
+    """
+    try:
+        status = asyncio.run(process_index_document(document_id, task_token))
+        return f"Document {document_id}: {status}"
+    except Exception as e:
+        logger.error(f"Error in index_document task: {e}", exc_info=True)
+        return f"Error: {e}"
@@ -1,16 +1,103 @@
 """Message handler that uses agentic workflow to process user messages."""
+import asyncio
 import logging
+import time
+from typing import AsyncIterator, Awaitable, Callable, List, Optional
+
 from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
-from agents.workflow import process_message
+from agents.workflow import process_message, stream_message
+from config import settings
 from telegram.states import MainStates
 from telegram.keyboards import get_main_menu_keyboard
 
 logger = logging.getLogger(__name__)
 router = Router()
 
+# Telegram's message length limit
+MAX_MESSAGE_LENGTH = 4096
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """Split text into parts Telegram accepts, cutting at line breaks where possible."""
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    parts.append(text)
+    return parts
+
+
+async def _deliver(send: Callable[..., Awaitable], text: str) -> None:
+    """
+    Send or edit with the bot's default formatting.
+    
+    Falls back to plain text if Telegram rejects the markup, so an answer the
+    user already saw streaming isn't followed by an error message.
+    """
+    for attempt in range(2):
+        try:
+            await send(text)
+            return
+        except TelegramRetryAfter as e:
+            if attempt:
+                raise
+            await asyncio.sleep(e.retry_after)
+        except TelegramBadRequest as e:
+            if "not modified" in str(e):
+                return
+            logger.warning(f"Formatted reply rejected ({e}), sending as plain text")
+            try:
+                await send(text, parse_mode=None)
+            except TelegramBadRequest as plain_error:
+                if "not modified" not in str(plain_error):
+                    logger.error(f"Plain text reply rejected: {plain_error}")
+            return
+
+
+async def answer_streaming(message: Message, events: AsyncIterator[dict]) -> None:
+    """
+    Reply with a streamed response, editing one message as tokens arrive.
+    
+    Edits are throttled to one per ``telegram_stream_interval`` seconds and
+    sent as plain text (partial HTML may not parse); the final response
+    replaces it with the bot's default formatting, continued in further
+    messages if it exceeds Telegram's length limit.
+    """
+    sent: Optional[Message] = None
+    text = ""
+    last_update = 0.0
+    response = ""
+    
+    async for event in events:
+        if event["type"] == "done":
+            response = event["content"]
+            break
+        
+        text += event["content"]
+        if time.monotonic() - last_update < settings.telegram_stream_interval:
+            continue
+        last_update = time.monotonic()
+        try:
+            if sent is None:
+                sent = await message.answer(text[:MAX_MESSAGE_LENGTH], parse_mode=None)
+            else:
+                await sent.edit_text(text[:MAX_MESSAGE_LENGTH], parse_mode=None)
+        except (TelegramBadRequest, TelegramRetryAfter) as e:
+            # Skip this update; the next one or the final edit catches up
+            logger.debug(f"Streaming update skipped: {e}")
+    
+    parts = split_message(response)
+    await _deliver(message.answer if sent is None else sent.edit_text, parts[0])
+    for part in parts[1:]:
+        await _deliver(message.answer, part)
+
 
 @router.message(MainStates.idle, F.text)
 @router.message(F.text & ~F.text.startswith("/") & ~F.text.in_([
@@ -54,15 +141,12 @@ async def message_handler(message: Message, state: FSMContext):
             **state_data
         }
         
-        # Process message through agentic workflow
-        response = await process_message(
+        # Process message through agentic workflow, showing the answer as it is generated
+        await answer_streaming(message, stream_message(
             user_id=user_id,
             message=user_message,
             context=context
-        )
-        
-        # Send response
-        await message.answer(response)
+        ))
         
     except Exception as e:
         logger.error(f"Error handling message: {e}", exc_info=True)